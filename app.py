@@ -1,16 +1,54 @@
 import os
 import re
+import sys
+import sqlite3
+import click
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it images are served at their original size
+    Image = ImageOps = None
 import uuid
 import json
-from datetime import datetime,timedelta
+import base64
+import csv
+import io
+import hashlib
+import hmac
+import mimetypes
+import threading
+import smtplib
+import socket
+import ipaddress
+import ssl
+import http.client
+import urllib.parse
+import urllib.request
+import random
+import time
+from bisect import bisect_left
+from itertools import permutations
+from collections import Counter, OrderedDict, namedtuple
+from contextlib import contextmanager
+from email.message import EmailMessage
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime,timedelta,timezone
 from flask_migrate import Migrate
 
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, g, has_app_context, abort, Response, stream_with_context, send_from_directory, send_file
+from flask import before_render_template, template_rendered
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event, and_, or_, bindparam
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from markupsafe import Markup
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
 
-shared_carts = {}
-shared_wishlists = {}
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 DB_PATH = os.path.abspath(os.path.join(BASE_DIR, '..', 'instance', 'grocery.db'))
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
@@ -22,8 +60,103 @@ app = Flask(
     static_url_path='/static'
 )
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-change-me')
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{DB_PATH}"
+app.config['CATALOG_CACHE_TTL'] = int(os.environ.get('CATALOG_CACHE_TTL', 300))
+app.config['CATALOG_CACHE_SIZE'] = int(os.environ.get('CATALOG_CACHE_SIZE', 1024))
+app.config['CATALOG_MAX_AGE'] = int(os.environ.get('CATALOG_MAX_AGE', 60))
+app.config['FRAGMENT_CACHE_SIZE'] = int(os.environ.get('FRAGMENT_CACHE_SIZE', 30000))
+# Written into the static folder by `python build.py`
+app.config['ASSET_MANIFEST'] = os.environ.get('ASSET_MANIFEST', 'manifest.json')
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 200))
+# Internal stats (/metrics, /api/catalog/cache) are only served to these networks
+# (comma separated IPs or CIDRs) or to requests bearing METRICS_TOKEN; both are off by default
+app.config['METRICS_ALLOW'] = os.environ.get('METRICS_ALLOW', '')
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN', '')
+app.config['ADMIN_USERNAME'] = os.environ.get('ADMIN_USERNAME', 'admin')
+app.config['SHARED_CART_TTL'] = int(os.environ.get('SHARED_CART_TTL', 7 * 24 * 3600))
+app.config['SHARED_CART_CACHE_SIZE'] = int(os.environ.get('SHARED_CART_CACHE_SIZE', 512))
+app.config['SHARED_CART_PURGE_INTERVAL'] = int(os.environ.get('SHARED_CART_PURGE_INTERVAL', 3600))
+app.config['CART_TTL'] = int(os.environ.get('CART_TTL', 30 * 24 * 3600))
+app.config['CART_CACHE_SIZE'] = int(os.environ.get('CART_CACHE_SIZE', 4096))
+# Werkzeug method string; changing it rehashes each user's password on their next login
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 16))
+app.config['PASSWORD_HASH_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+app.config['LOGIN_RATE_PER_MINUTE'] = float(os.environ.get('LOGIN_RATE_PER_MINUTE', 10))
+app.config['LOGIN_BURST'] = int(os.environ.get('LOGIN_BURST', 10))
+app.config['LOGIN_IP_RATE_PER_MINUTE'] = float(os.environ.get('LOGIN_IP_RATE_PER_MINUTE', 30))
+app.config['LOGIN_IP_BURST'] = int(os.environ.get('LOGIN_IP_BURST', 30))
+# Roll orders into the analytics tables inside checkout itself instead of from a background job
+app.config['SALES_ROLLUP_INLINE'] = os.environ.get('SALES_ROLLUP_INLINE', '0') == '1'
+app.config['SALES_ROLLUP_BATCH'] = int(os.environ.get('SALES_ROLLUP_BATCH', 1000))
+app.config['SALES_ROLLUP_INTERVAL'] = int(os.environ.get('SALES_ROLLUP_INTERVAL', 60))
+app.config['SALES_ROLLUP_MAX_BATCHES'] = int(os.environ.get('SALES_ROLLUP_MAX_BATCHES', 5))
+# Orders younger than this (seconds) are left for a later catch-up, so a checkout that commits late is not skipped
+app.config['SALES_ROLLUP_LAG'] = int(os.environ.get('SALES_ROLLUP_LAG', 30))
+app.config['RECOMMENDATION_LIMIT'] = int(os.environ.get('RECOMMENDATION_LIMIT', 8))
+app.config['RECOMMENDATION_MAX_BASKET'] = int(os.environ.get('RECOMMENDATION_MAX_BASKET', 50))
+app.config['JOB_WORKER_THREADS'] = int(os.environ.get('JOB_WORKER_THREADS', 2))
+app.config['JOB_POLL_INTERVAL'] = float(os.environ.get('JOB_POLL_INTERVAL', 1.0))
+app.config['JOB_LEASE_SECONDS'] = int(os.environ.get('JOB_LEASE_SECONDS', 300))
+app.config['JOB_MAX_ATTEMPTS'] = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+app.config['JOB_RETRY_BASE'] = float(os.environ.get('JOB_RETRY_BASE', 10))
+app.config['JOB_RETRY_MAX'] = float(os.environ.get('JOB_RETRY_MAX', 3600))
+app.config['JOB_RETENTION'] = int(os.environ.get('JOB_RETENTION', 7 * 24 * 3600))
+app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', '')
+app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 25))
+app.config['MAIL_SENDER'] = os.environ.get('MAIL_SENDER', 'orders@grocery.local')
+app.config['ADMIN_EMAIL'] = os.environ.get('ADMIN_EMAIL', '')
+app.config['IMAGE_DIR'] = os.environ.get('IMAGE_DIR', os.path.join(os.path.dirname(DB_PATH), 'images'))
+app.config['IMAGE_FETCH_TIMEOUT'] = float(os.environ.get('IMAGE_FETCH_TIMEOUT', 10))
+app.config['IMAGE_MAX_BYTES'] = int(os.environ.get('IMAGE_MAX_BYTES', 10 * 1024 * 1024))
+# Only for local stand-in image servers; keeps admins from pointing the fetcher at internal hosts
+app.config['IMAGE_ALLOW_PRIVATE'] = os.environ.get('IMAGE_ALLOW_PRIVATE', '0') == '1'
+
+# -------------------- Database Configuration --------------------
+def database_uri():
+    """DATABASE_URL if set (Render/Heroku style postgres:// is accepted), else the local SQLite file"""
+    uri = os.environ.get('DATABASE_URL')
+    if not uri:
+        return f"sqlite:///{DB_PATH}"
+    if uri.startswith('postgres://'):
+        uri = uri.replace('postgres://', 'postgresql://', 1)
+    return uri
+
+def engine_options(uri):
+    """Connection pool settings for server databases; SQLite keeps SQLAlchemy's defaults"""
+    if uri.startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True,
+    }
+
+app.config['SQLALCHEMY_DATABASE_URI'] = database_uri()
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLITE_TUNING'] = os.environ.get('SQLITE_TUNING', '1') != '0'
+app.config['SQLITE_PRAGMAS'] = (
+    # WAL lets readers run alongside the single writer instead of blocking on it
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))),
+    ('mmap_size', int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))),
+    # Negative values are KiB rather than pages
+    ('cache_size', -int(os.environ.get('SQLITE_CACHE_KB', 64 * 1024))),
+)
+
+@event.listens_for(Engine, 'connect')
+def tune_sqlite_connection(dbapi_connection, connection_record):
+    """Apply the SQLite pragmas to every new connection"""
+    if not app.config['SQLITE_TUNING'] or not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in app.config['SQLITE_PRAGMAS']:
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
 
 db = SQLAlchemy(app)
 migrate=Migrate(app,db)
@@ -40,35 +173,42 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def set_password(self, pwd):
-        self.password_hash = generate_password_hash(pwd)
+        self.password_hash = password_hasher.hash(pwd)
 
     def check_password(self, pwd):
-        return check_password_hash(self.password_hash, pwd)
+        return password_hasher.verify(self.password_hash, pwd)
+
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
 
 class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(120), nullable=False)
+    name = db.Column(db.String(120), nullable=False, index=True)
     description = db.Column(db.Text, default='')
     price = db.Column(db.Float, nullable=False)
     image_url = db.Column(db.String(255), default='https://via.placeholder.com/300x200?text=No+Image')
     category = db.Column(db.String(80), default='General')
     stock = db.Column(db.Integer, default=100)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    # Category listings filter on category and sort newest first
+    __table_args__ = (db.Index('ix_product_category_created_at', 'category', 'created_at'),)
 
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     customer_name = db.Column(db.String(120), nullable=False)
-    customer_email = db.Column(db.String(120), nullable=False)
+    customer_email = db.Column(db.String(120), nullable=False, index=True)
     address = db.Column(db.String(255), nullable=False)
     total_amount = db.Column(db.Float, nullable=False)
     donation_amount = db.Column(db.Float, default=0.0)
     charity_name = db.Column(db.String(120), default='')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False, index=True)
     quantity = db.Column(db.Integer, default=1)
     unit_price = db.Column(db.Float, nullable=False)
 
@@ -76,7 +216,14 @@ class SharedCart(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     token = db.Column(db.String(36), unique=True, nullable=False)
     cart_data = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class CartSession(db.Model):
+    """Server-side cart; the cookie only carries the id and current version"""
+    id = db.Column(db.String(32), primary_key=True)
+    version = db.Column(db.String(16), nullable=False)
+    cart_data = db.Column(db.Text, nullable=False, default='{}')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
 class Wishlist(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -88,7 +235,7 @@ class Wishlist(db.Model):
     user = db.relationship('User', backref=db.backref('wishlist_items', lazy=True))
     product = db.relationship('Product', backref=db.backref('wishlist_items', lazy=True))
     
-    # Ensure unique combination of user_id and product_id
+    # Ensure unique combination of user_id and product_id; its index also serves user_id lookups
     __table_args__ = (db.UniqueConstraint('user_id', 'product_id', name='unique_user_product'),)
 
 class SharedWishlist(db.Model):
@@ -97,7 +244,7 @@ class SharedWishlist(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     wishlist_data = db.Column(db.Text, nullable=False)  # JSON string
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    expires_at = db.Column(db.DateTime, default=lambda: datetime.utcnow() + timedelta(days=30))
+    expires_at = db.Column(db.DateTime, default=lambda: datetime.utcnow() + timedelta(days=30), index=True)
     
     # Relationship
     user = db.relationship('User', backref=db.backref('shared_wishlists', lazy=True))
@@ -110,83 +257,594 @@ class Charity(db.Model):
     active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class DailySales(db.Model):
+    """Per-day order totals (UTC), maintained incrementally by the sales rollup"""
+    day = db.Column(db.Date, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    items_sold = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)  # goods only, donations excluded
+    donations = db.Column(db.Float, nullable=False, default=0.0)
+
+class ProductSales(db.Model):
+    # No foreign key: sales history outlives deleted products
+    product_id = db.Column(db.Integer, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    quantity = db.Column(db.Integer, nullable=False, default=0, index=True)
+    revenue = db.Column(db.Float, nullable=False, default=0.0, index=True)
+
+class CharityDonation(db.Model):
+    charity_name = db.Column(db.String(120), primary_key=True)
+    donations = db.Column(db.Integer, nullable=False, default=0)
+    amount = db.Column(db.Float, nullable=False, default=0.0, index=True)
+
+class ProductPair(db.Model):
+    """Sparse co-purchase matrix: orders containing both products, stored in both directions.
+
+    The diagonal row (product_id == other_id) counts the orders containing the product at all.
+    """
+    product_id = db.Column(db.Integer, primary_key=True)
+    other_id = db.Column(db.Integer, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+
+class ProductRecommendation(db.Model):
+    """Top co-purchased products per product, ranked from ProductPair"""
+    product_id = db.Column(db.Integer, primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    other_id = db.Column(db.Integer, nullable=False)
+    # Share of this product's orders that also contained other_id
+    score = db.Column(db.Float, nullable=False)
+
+class RollupWatermark(db.Model):
+    """Highest source row id already folded into a rollup"""
+    name = db.Column(db.String(40), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+@event.listens_for(RollupWatermark.__table__, 'after_create')
+def start_sales_watermark(target, connection, **kw):
+    """Start the order watermarks at zero so checkout can roll up from the very first order"""
+    connection.execute(target.insert(), [{'name': 'orders', 'last_id': 0}, {'name': 'copurchase', 'last_id': 0}])
+
+class Job(db.Model):
+    """Durable background task; see the Background Jobs section"""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(60), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    # Enqueueing the same key twice is a no-op, so retries of the caller can't duplicate work
+    idempotency_key = db.Column(db.String(120), unique=True)
+    status = db.Column(db.String(16), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_by = db.Column(db.String(32))
+    locked_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, index=True)
+
+    # Workers look for due jobs by status and run_at
+    __table_args__ = (db.Index('ix_job_status_run_at', 'status', 'run_at'),)
+
+class ImageAsset(db.Model):
+    """A remote product image and the content hash of its locally stored copy"""
+    id = db.Column(db.Integer, primary_key=True)
+    source_url = db.Column(db.String(255), unique=True, nullable=False)
+    content_hash = db.Column(db.String(64))
+    status = db.Column(db.String(16), nullable=False, default='pending')
+    fetched_at = db.Column(db.DateTime)
+
+# -------------------- Password Hashing --------------------
+class HasherBusy(Exception):
+    """Too many password hashes are already queued"""
+
+def hash_parameters(method):
+    """Normalize a werkzeug hash method to (algorithm, *parameters), filling in werkzeug's defaults.
+
+    'pbkdf2:sha256' and 'pbkdf2:sha256:600000' come out the same. Returns None
+    for methods werkzeug can't produce.
+    """
+    name, *args = method.split(':')
+    try:
+        if name == 'scrypt' and len(args) in (0, 3):
+            return ('scrypt', *(map(int, args) if args else (2 ** 15, 8, 1)))
+        if name == 'pbkdf2' and len(args) <= 2:
+            iterations = int(args[1]) if len(args) == 2 else DEFAULT_PBKDF2_ITERATIONS
+            return ('pbkdf2', args[0] if args else 'sha256', iterations)
+    except ValueError:
+        pass
+    return None
+
+class PasswordHasher:
+    """Runs password hashing in a bounded process pool.
+
+    At most queue_depth hashes can be pending at once; anything beyond that is
+    rejected straight away instead of tying up another request thread. With
+    workers=0 hashing runs inline, which is handy for development.
+    """
+
+    def __init__(self, method, workers, queue_depth, timeout):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(queue_depth)
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        # A pool inherited across a fork (e.g. gunicorn preload) has no live workers
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            return self._executor().submit(fn, *args).result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise HasherBusy()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if the hash uses another algorithm or a lower cost than the configured method"""
+        current = hash_parameters(password_hash.split('$', 1)[0])
+        wanted = hash_parameters(self.method)
+        if current is None or wanted is None or len(current) != len(wanted):
+            return True
+        # Costs may be higher than configured; only weaker hashes are upgraded
+        return any(c < w if isinstance(w, int) else c != w for c, w in zip(current, wanted))
+
+password_hasher = PasswordHasher(
+    app.config['PASSWORD_HASH_METHOD'],
+    app.config['PASSWORD_HASH_WORKERS'],
+    app.config['PASSWORD_HASH_QUEUE'],
+    app.config['PASSWORD_HASH_TIMEOUT'],
+)
+
 # -------------------- Database Initialization --------------------
+@contextmanager
+def bootstrap_lock():
+    """Serialize schema creation and seeding across processes.
+
+    Uses a Postgres advisory lock on server databases and a file lock next to
+    the SQLite database otherwise, so concurrent deploy hooks can't race on the
+    seed writes.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql('SELECT pg_advisory_lock(724001)')
+            try:
+                yield
+            finally:
+                conn.exec_driver_sql('SELECT pg_advisory_unlock(724001)')
+        return
+    if fcntl is None:
+        # No cross-process locking on this platform; seeding is still idempotent
+        yield
+        return
+    with open(os.path.join(os.path.dirname(DB_PATH), 'bootstrap.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
 def init_db():
     """Initialize database with tables and seed data"""
-    with app.app_context():
+    with app.app_context(), bootstrap_lock():
         db.create_all()
         print("Database tables created/verified.")
-        
-        try:
-            if not User.query.filter_by(username='admin').first():
-                admin = User(
-                    name='Administrator',
-                    username='admin', 
-                    email='admin@grocery.com',
-                    address='Admin Office',
-                    contact_number='1234567890'
-                )
-                admin.set_password('admin123')
-                db.session.add(admin)
-                db.session.commit()
-                print("Admin user created.")
-            else:
-                print("Admin user already exists.")
-        except Exception as e:
-            print(f"Error with admin user: {e}")
-            db.session.rollback()
-        
-        try:
-            if Product.query.count() == 0:
-                seed_products = [
-                    Product(name='Fresh Apples (1kg)', description='Crisp and sweet red apples.', price=120.0, category='Fruits', image_url='https://upload.wikimedia.org/wikipedia/commons/thumb/1/15/Red_Apple.jpg/800px-Red_Apple.jpg'),
-                    Product(name='Bananas (1 dozen)', description='Ripe bananas full of potassium.', price=60.0, category='Fruits',  image_url='https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcSiph_r-pTwfrGBghkxIdd3PEz0Z_oqH7wTeA&s'),
-                    Product(name='Whole Wheat Bread', description='Soft and healthy bread loaf.', price=45.0, category='Bakery', image_url='https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcS3tzH2DPXSqmbOn3ygcB5KI5q-CIMbY3aQqA&s'),
-                    Product(name='Organic Milk (1L)', description='Farm fresh organic milk.', price=70.0, category='Dairy', image_url='https://mea.arla.com/4970d5/globalassets/arla-organic-milk/general/arla_organic_milk-product_range.jpg'),
-                    Product(name='Brown Eggs (12pc)', description='Free-range brown eggs.', price=85.0, category='Dairy', image_url='https://cdn.britannica.com/94/151894-050-F72A5317/Brown-eggs.jpg'),
-                    Product(name='Basmati Rice (5kg)', description='Long-grain aromatic rice.', price=520.0, category='Grains', image_url='https://flourworks.in/wp-content/uploads/2023/06/1-12.jpeg'), 
-                    Product(name='Notebook (200 pages)', description='College ruled notebook.', price=50.0, category='Stationary', image_url='https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcSgONwv10P8D4pN_96QMbOVUlG63DXVFPgpHg&s'),
-                    Product(name='Ballpoint Pen (Pack of 5)', description='Smooth writing pens.', price=30.0, category='Stationary', image_url='https://static2.jetpens.com/images/a/000/253/253360.jpg?s=4378aba1d97fd5134ee408f1e42e5e9c'),
-                    Product(name='Fresh Carrots (1kg)', description='Organic carrots.', price=40.0, category='Vegetables', image_url='https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcTWp3Vx2S_zSSRoLboLpODBfF2QR-HOXcKFKg&s'),
-                    Product(name='Tomatoes (1kg)', description='Fresh red tomatoes.', price=35.0, category='Vegetables', image_url='https://media.post.rvohealth.io/wp-content/uploads/2020/09/AN313-Tomatoes-732x549-Thumb.jpg'),
-                ]
-                db.session.bulk_save_objects(seed_products)
-                db.session.commit()
-                print("Sample products added.")
-            else:
-                print("Products already exist in database.")
-        except Exception as e:
-            print(f"Error seeding products: {e}")
-            db.session.rollback()
-        
-        # Add sample charities
-        try:
-            if Charity.query.count() == 0:
-                sample_charities = [
-                    Charity(name='Feed the Hungry', description='Providing meals to underprivileged families', website='https://feedthehungry.org'),
-                    Charity(name='Education for All', description='Supporting education for disadvantaged children', website='https://educationforall.org'),
-                    Charity(name='Clean Water Foundation', description='Bringing clean water to rural communities', website='https://cleanwater.org'),
-                    Charity(name='Medical Aid Society', description='Providing healthcare to those in need', website='https://medicalaid.org'),
-                    Charity(name='Environmental Care', description='Protecting our environment for future generations', website='https://environmentalcare.org'),
-                ]
-                db.session.bulk_save_objects(sample_charities)
-                db.session.commit()
-                print("Sample charities added.")
-            else:
-                print("Charities already exist in database.")
-        except Exception as e:
-            print(f"Error seeding charities: {e}")
-            db.session.rollback()
+        seed_db()
+
+def seed_db():
+    """Add the admin user, sample products and charities if they are missing"""
+    try:
+        if not User.query.filter_by(username='admin').first():
+            admin = User(
+                name='Administrator',
+                username='admin', 
+                email='admin@grocery.com',
+                address='Admin Office',
+                contact_number='1234567890'
+            )
+            admin.set_password('admin123')
+            db.session.add(admin)
+            db.session.commit()
+            print("Admin user created.")
+        else:
+            print("Admin user already exists.")
+    except Exception as e:
+        print(f"Error with admin user: {e}")
+        db.session.rollback()
+    
+    try:
+        if Product.query.count() == 0:
+            seed_products = [
+                Product(name='Fresh Apples (1kg)', description='Crisp and sweet red apples.', price=120.0, category='Fruits', image_url='https://upload.wikimedia.org/wikipedia/commons/thumb/1/15/Red_Apple.jpg/800px-Red_Apple.jpg'),
+                Product(name='Bananas (1 dozen)', description='Ripe bananas full of potassium.', price=60.0, category='Fruits',  image_url='https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcSiph_r-pTwfrGBghkxIdd3PEz0Z_oqH7wTeA&s'),
+                Product(name='Whole Wheat Bread', description='Soft and healthy bread loaf.', price=45.0, category='Bakery', image_url='https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcS3tzH2DPXSqmbOn3ygcB5KI5q-CIMbY3aQqA&s'),
+                Product(name='Organic Milk (1L)', description='Farm fresh organic milk.', price=70.0, category='Dairy', image_url='https://mea.arla.com/4970d5/globalassets/arla-organic-milk/general/arla_organic_milk-product_range.jpg'),
+                Product(name='Brown Eggs (12pc)', description='Free-range brown eggs.', price=85.0, category='Dairy', image_url='https://cdn.britannica.com/94/151894-050-F72A5317/Brown-eggs.jpg'),
+                Product(name='Basmati Rice (5kg)', description='Long-grain aromatic rice.', price=520.0, category='Grains', image_url='https://flourworks.in/wp-content/uploads/2023/06/1-12.jpeg'), 
+                Product(name='Notebook (200 pages)', description='College ruled notebook.', price=50.0, category='Stationary', image_url='https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcSgONwv10P8D4pN_96QMbOVUlG63DXVFPgpHg&s'),
+                Product(name='Ballpoint Pen (Pack of 5)', description='Smooth writing pens.', price=30.0, category='Stationary', image_url='https://static2.jetpens.com/images/a/000/253/253360.jpg?s=4378aba1d97fd5134ee408f1e42e5e9c'),
+                Product(name='Fresh Carrots (1kg)', description='Organic carrots.', price=40.0, category='Vegetables', image_url='https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcTWp3Vx2S_zSSRoLboLpODBfF2QR-HOXcKFKg&s'),
+                Product(name='Tomatoes (1kg)', description='Fresh red tomatoes.', price=35.0, category='Vegetables', image_url='https://media.post.rvohealth.io/wp-content/uploads/2020/09/AN313-Tomatoes-732x549-Thumb.jpg'),
+            ]
+            db.session.bulk_save_objects(seed_products)
+            queue_image_fetches(p.image_url for p in seed_products)
+            db.session.commit()
+            print("Sample products added.")
+        else:
+            print("Products already exist in database.")
+    except Exception as e:
+        print(f"Error seeding products: {e}")
+        db.session.rollback()
+    
+    # Add sample charities
+    try:
+        if Charity.query.count() == 0:
+            sample_charities = [
+                Charity(name='Feed the Hungry', description='Providing meals to underprivileged families', website='https://feedthehungry.org'),
+                Charity(name='Education for All', description='Supporting education for disadvantaged children', website='https://educationforall.org'),
+                Charity(name='Clean Water Foundation', description='Bringing clean water to rural communities', website='https://cleanwater.org'),
+                Charity(name='Medical Aid Society', description='Providing healthcare to those in need', website='https://medicalaid.org'),
+                Charity(name='Environmental Care', description='Protecting our environment for future generations', website='https://environmentalcare.org'),
+            ]
+            db.session.bulk_save_objects(sample_charities)
+            db.session.commit()
+            print("Sample charities added.")
+        else:
+            print("Charities already exist in database.")
+    except Exception as e:
+        print(f"Error seeding charities: {e}")
+        db.session.rollback()
 
-# Initialize database when app starts
-with app.app_context():
+@app.cli.command('init-db')
+def init_db_command():
+    """Create missing tables and seed sample data."""
     init_db()
 
+@app.cli.command('seed')
+def seed_command():
+    """Seed the admin user, sample products and charities."""
+    with bootstrap_lock():
+        seed_db()
+
+# -------------------- Catalog Cache --------------------
+ProductSnapshot = namedtuple('ProductSnapshot', ['id', 'name', 'description', 'price', 'image_url', 'category', 'stock', 'created_at', 'updated_at'])
+
+def snapshot_product(p):
+    """Copy a Product into an immutable snapshot that is safe to share between requests"""
+    return ProductSnapshot(p.id, p.name, p.description, p.price, p.image_url, p.category, p.stock, p.created_at, p.updated_at)
+
+class CatalogCache:
+    """Versioned, TTL and LRU bounded in-process cache for catalog reads.
+
+    Every committed Product write bumps the version and drops all entries, so
+    readers never see a stale catalog within this process. The TTL bounds how
+    long other workers can serve data from before a write they did not see.
+
+    Misses are single-flight: the first caller builds the entry and concurrent
+    callers for the same key wait for it instead of all rebuilding at once.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self._entries = OrderedDict()
+        self._loading = {}  # key -> (version, Event) for entries being built
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry and entry[0] == self.version and entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                version = self.version
+                flight = self._loading.get(key)
+                if flight is None:
+                    flight = (version, threading.Event())
+                    self._loading[key] = flight
+                    self.misses += 1
+                    break
+                self.waits += 1
+            # Someone else is loading this version; re-check once they are done
+            flight[1].wait()
+        try:
+            value = loader()
+            with self._lock:
+                # Don't store a value that was loaded while a write was committing;
+                # invalidate() and discard() both cancel the flight
+                if self._loading.get(key) is flight:
+                    self._entries[key] = (version, now + self.ttl, value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        finally:
+            with self._lock:
+                if self._loading.get(key) is flight:
+                    del self._loading[key]
+            flight[1].set()
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._loading.clear()
+
+    def discard(self, keys):
+        """Drop individual entries without invalidating the rest of the catalog"""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                self._loading.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self.version,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'waits': self.waits,
+            }
+
+catalog_cache = CatalogCache(app.config['CATALOG_CACHE_SIZE'], app.config['CATALOG_CACHE_TTL'])
+
+@event.listens_for(db.session, 'after_flush')
+def mark_catalog_dirty(session, flush_context):
+    """Remember that this transaction touched the catalog"""
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Product):
+            session.info['catalog_dirty'] = True
+            return
+
+@event.listens_for(db.session, 'do_orm_execute')
+def mark_catalog_dirty_bulk(orm_execute_state):
+    """Catch query-level UPDATE/DELETE statements against Product.
+
+    Stock reservations opt out; place_order drops just the ordered products' entries.
+    """
+    if orm_execute_state.execution_options.get('stock_only'):
+        return
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ is Product:
+            orm_execute_state.session.info['catalog_dirty'] = True
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_catalog_on_commit(session):
+    stale = session.info.pop('catalog_stale', None)
+    if session.info.pop('catalog_dirty', False):
+        catalog_cache.invalidate()
+    elif stale:
+        catalog_cache.discard(stale)
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_catalog_dirty(session):
+    session.info.pop('catalog_dirty', None)
+    session.info.pop('catalog_stale', None)
+
+def catalog_products():
+    """All products, newest first"""
+    return catalog_cache.get('products', lambda: tuple(
+        snapshot_product(p) for p in Product.query.order_by(Product.created_at.desc()).all()
+    ))
+
+def catalog_categories():
+    return catalog_cache.get('categories', lambda: tuple(
+        c[0] for c in db.session.query(Product.category).distinct().all()
+    ))
+
+def catalog_listing(category):
+    """Products in a single category, built from the cached full listing"""
+    return catalog_cache.get(('category', category), lambda: tuple(
+        p for p in catalog_products() if p.category == category
+    ))
+
+def catalog_product(pid):
+    def load():
+        product = db.session.get(Product, pid)
+        return snapshot_product(product) if product else None
+    return catalog_cache.get(('product', pid), load)
+
+CatalogState = namedtuple('CatalogState', ['etag', 'last_modified'])
+
+def catalog_state():
+    """Catalog-wide validator shared by every worker.
+
+    Derived from the data rather than the in-process cache version, so two
+    workers looking at the same catalog hand out the same ETag.
+    """
+    def load():
+        count, max_id, last_modified = db.session.query(
+            db.func.count(Product.id), db.func.max(Product.id), db.func.max(Product.updated_at)
+        ).one()
+        digest = hashlib.sha1(f'{count}:{max_id}:{last_modified}'.encode()).hexdigest()
+        return CatalogState(digest, last_modified)
+    return catalog_cache.get('state', load)
+
+def stock_state():
+    """Validator for stock levels, which checkout changes without touching Product.updated_at"""
+    def load():
+        last_id, last_at = db.session.query(db.func.max(Order.id), db.func.max(Order.created_at)).one()
+        return CatalogState(str(last_id or 0), last_at)
+    return catalog_cache.get('stock_state', load)
+
+# -------------------- Product Search --------------------
+SEARCH_TOKEN_RE = re.compile(r'[a-z0-9]+')
+SEARCH_FIELD_WEIGHTS = (('name', 3.0), ('category', 2.0), ('description', 1.0))
+
+def tokenize(text):
+    return SEARCH_TOKEN_RE.findall((text or '').lower())
+
+class SearchIndex:
+    """In-memory inverted index over product name, category and description.
+
+    Terms are kept sorted so a prefix lookup is a bisect plus a scan over the
+    matching terms only, independent of how many products are in the catalog.
+    """
+
+    def __init__(self, products):
+        self.products = {}
+        self.rank = {}
+        postings = {}
+        for position, p in enumerate(products):
+            self.products[p.id] = p
+            self.rank[p.id] = position
+            for field, weight in SEARCH_FIELD_WEIGHTS:
+                for term in tokenize(getattr(p, field)):
+                    scores = postings.setdefault(term, {})
+                    scores[p.id] = scores.get(p.id, 0.0) + weight
+        self.postings = postings
+        self.terms = sorted(postings)
+
+    def _matches(self, token):
+        """Score every product with a term starting with token; exact terms score higher"""
+        scores = {}
+        start = bisect_left(self.terms, token)
+        for term in self.terms[start:]:
+            if not term.startswith(token):
+                break
+            boost = 1.0 if term == token else 0.5
+            for pid, score in self.postings[term].items():
+                scores[pid] = max(scores.get(pid, 0.0), score * boost)
+        return scores
+
+    def search(self, query, category=None):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        per_token = sorted((self._matches(t) for t in set(tokens)), key=len)
+        # Every token has to match; start from the rarest one
+        totals = dict(per_token[0])
+        for scores in per_token[1:]:
+            totals = {pid: total + scores[pid] for pid, total in totals.items() if pid in scores}
+            if not totals:
+                return []
+        results = [self.products[pid] for pid in totals]
+        if category:
+            results = [p for p in results if p.category == category]
+        results.sort(key=lambda p: (-totals[p.id], self.rank[p.id]))
+        return results
+
+def search_products(q, category=None):
+    """Ranked prefix search over the cached catalog"""
+    index = catalog_cache.get('search_index', lambda: SearchIndex(catalog_products()))
+    return index.search(q, category)
+
+
+# -------------------- Fragment Cache --------------------
+class FragmentCache:
+    """Bounded LRU of rendered HTML fragments.
+
+    Keys include the data a fragment was rendered from (a product snapshot,
+    the category tuple), so a changed product simply misses and its old
+    entries age out; nothing ever needs invalidating.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, render):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return html
+            self.misses += 1
+        html = Markup(render())
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return html
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+fragment_cache = FragmentCache(app.config['FRAGMENT_CACHE_SIZE'])
+
+def render_fragment(template_name, **context):
+    """Render a partial without request context or render signals; fragments must not read the session"""
+    return app.jinja_env.get_template(template_name).render(**context)
+
+def product_card(product, wishlist_state):
+    """One product card; wishlist_state is 'login', 'add' or 'remove'"""
+    # The image URL switches to the local copy once it has been fetched, so it is part of the key
+    image = image_index.get(product.image_url)
+    return fragment_cache.get(('product_card', product, wishlist_state, image), lambda: render_fragment(
+        'product_card.html', product=product, wishlist_state=wishlist_state
+    ))
+
+def product_cards(listing_key, products, wishlist=None):
+    """Cards for a listing with the per-user wishlist state overlaid.
+
+    wishlist is None for anonymous visitors, else the user's wishlisted ids.
+    When every card is in the same state the joined HTML is cached per
+    catalog version, so a warm listing costs one lookup whatever its size.
+    Pass listing_key=None for listings built from free-form input such as a
+    search query; their joins would only crowd the catalog out of the cache.
+    """
+    if wishlist is None or not wishlist.intersection(p.id for p in products):
+        state = 'login' if wishlist is None else 'add'
+        join = lambda: Markup('\n'.join(product_card(p, state) for p in products))
+        if listing_key is None:
+            return join()
+        return catalog_cache.get(('product_cards', listing_key, state, image_index.version), join)
+    return Markup('\n'.join(product_card(p, 'remove' if p.id in wishlist else 'add') for p in products))
+
+@app.template_global()
+def category_nav():
+    categories = catalog_categories()
+    return fragment_cache.get(('category_nav', categories), lambda: render_fragment(
+        'category_nav.html', categories=categories
+    ))
+
+def user_wishlist_ids(user_id):
+    """The user's wishlisted product ids as a set, one index-only query per request"""
+    if 'wishlist_ids' not in g:
+        g.wishlist_ids = frozenset(db.session.scalars(
+            db.select(Wishlist.product_id).where(Wishlist.user_id == user_id)
+        ))
+    return g.wishlist_ids
+
 # -------------------- Authentication Helper --------------------
 def login_required(f):
     """Decorator to require login for certain routes"""
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
+            if request.path.startswith('/api/') or wants_json():
+                return jsonify({'error': 'Login required.'}), 401
             flash("Please log in to continue.", "warning")
             # Store the URL user was trying to access
             session['next_url'] = request.url
@@ -195,6 +853,51 @@ def login_required(f):
     decorated_function.__name__ = f.__name__
     return decorated_function
 
+def admin_required(f):
+    """Decorator to require an admin session"""
+    def decorated_function(*args, **kwargs):
+        if not session.get('is_admin'):
+            if request.path.startswith('/admin/api/') or request.is_json:
+                return jsonify({'error': 'Admin login required.'}), 401
+            flash("Please log in as admin to continue.", "warning")
+            return redirect(url_for('admin_login'))
+        return f(*args, **kwargs)
+    decorated_function.__name__ = f.__name__
+    return decorated_function
+
+# -------------------- Rate Limiting --------------------
+class TokenBucketLimiter:
+    """Per-key token buckets, keeping at most max_keys buckets in memory"""
+
+    def __init__(self, rate_per_minute, burst, max_keys=10000):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed
+
+login_email_limiter = TokenBucketLimiter(app.config['LOGIN_RATE_PER_MINUTE'], app.config['LOGIN_BURST'])
+login_ip_limiter = TokenBucketLimiter(app.config['LOGIN_IP_RATE_PER_MINUTE'], app.config['LOGIN_IP_BURST'])
+
+def auth_rate_limited(email=None):
+    """Charge the caller's IP (and email, if given) one attempt; True when over the limit"""
+    ip_ok = login_ip_limiter.allow(request.remote_addr or 'unknown')
+    email_ok = login_email_limiter.allow(email.lower()) if email else True
+    return not (ip_ok and email_ok)
+
 # -------------------- Validation Helpers --------------------
 def is_valid_email(email):
     """Check if email format is valid"""
@@ -213,20 +916,316 @@ def is_strong_password(password):
     
     return has_upper and has_lower and has_digit and has_special
 
+# -------------------- Instrumentation --------------------
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def prometheus_labels(labels):
+    if not labels:
+        return ''
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in labels) + '}'
+
+class Metrics:
+    """Thread-safe counters and histograms rendered in Prometheus text format"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, labels=(), value=1.0):
+        key = (name, tuple(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    hist[0][i] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    def render(self, gauges=()):
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+        described = set()
+
+        def header(name):
+            if name in self._help and name not in described:
+                kind, text = self._help[name]
+                lines.append(f'# HELP {name} {text}')
+                lines.append(f'# TYPE {name} {kind}')
+                described.add(name)
+
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f'{name}{prometheus_labels(labels)} {value}')
+        for (name, labels), (bucket_counts, total, count) in histograms:
+            header(name)
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                lines.append(f'{name}_bucket{prometheus_labels(labels + (("le", bound),))} {bucket_count}')
+            lines.append(f'{name}_bucket{prometheus_labels(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{name}_sum{prometheus_labels(labels)} {total}')
+            lines.append(f'{name}_count{prometheus_labels(labels)} {count}')
+        for name, text, value in gauges:
+            lines.append(f'# HELP {name} {text}')
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics(LATENCY_BUCKETS)
+metrics.describe('grocery_request_duration_seconds', 'histogram', 'Request latency by endpoint.')
+metrics.describe('grocery_requests_total', 'counter', 'Requests by endpoint and status.')
+metrics.describe('grocery_db_queries_total', 'counter', 'SQL statements issued by endpoint.')
+metrics.describe('grocery_db_seconds_total', 'counter', 'Time spent in SQL statements by endpoint.')
+metrics.describe('grocery_template_render_seconds', 'histogram', 'Template render time.')
+metrics.describe('grocery_slow_queries_total', 'counter', 'SQL statements slower than SLOW_QUERY_MS.')
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    """Count SQL statements issued during the current request and start their timer"""
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+    if has_app_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def time_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    if has_app_context():
+        g.db_time = g.get('db_time', 0.0) + elapsed
+    if elapsed * 1000 >= app.config['SLOW_QUERY_MS']:
+        metrics.inc('grocery_slow_queries_total')
+        app.logger.warning('Slow query (%.1f ms): %s', elapsed * 1000, statement)
+
+@before_render_template.connect_via(app)
+def start_render_timer(sender, template, context, **extra):
+    g.setdefault('render_starts', []).append(time.perf_counter())
+
+@template_rendered.connect_via(app)
+def stop_render_timer(sender, template, context, **extra):
+    elapsed = time.perf_counter() - g.render_starts.pop()
+    g.render_time = g.get('render_time', 0.0) + elapsed
+    metrics.observe('grocery_template_render_seconds', (('template', template.name),), elapsed)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Expose per-request query counts and record latency, SQL and render time"""
+    response.headers['X-Query-Count'] = str(g.get('query_count', 0))
+    if 'request_start' in g:
+        endpoint = request.endpoint or 'unknown'
+        elapsed = time.perf_counter() - g.request_start
+        labels = (('endpoint', endpoint), ('method', request.method))
+        metrics.observe('grocery_request_duration_seconds', labels, elapsed)
+        metrics.inc('grocery_requests_total', labels + (('status', response.status_code),))
+        metrics.inc('grocery_db_queries_total', (('endpoint', endpoint),), g.get('query_count', 0))
+        metrics.inc('grocery_db_seconds_total', (('endpoint', endpoint),), g.get('db_time', 0.0))
+        response.headers['Server-Timing'] = (
+            f"db;dur={g.get('db_time', 0.0) * 1000:.1f}, "
+            f"render;dur={g.get('render_time', 0.0) * 1000:.1f}, "
+            f"total;dur={elapsed * 1000:.1f}"
+        )
+    return response
+
+METRICS_NETWORKS = tuple(
+    ipaddress.ip_network(net.strip(), strict=False) for net in app.config['METRICS_ALLOW'].split(',') if net.strip()
+)
+
+def internal_only(f):
+    """Decorator for operational endpoints; anyone else gets a 404"""
+    def decorated_function(*args, **kwargs):
+        token = app.config['METRICS_TOKEN']
+        authorized = bool(token) and hmac.compare_digest(
+            request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode())
+        if not authorized:
+            try:
+                address = ipaddress.ip_address(request.remote_addr or '')
+            except ValueError:
+                abort(404)
+            if not any(address in network for network in METRICS_NETWORKS):
+                abort(404)
+        return f(*args, **kwargs)
+    decorated_function.__name__ = f.__name__
+    return decorated_function
+
+@app.route('/metrics')
+@internal_only
+def metrics_endpoint():
+    cache = catalog_cache.stats()
+    gauges = (
+        ('grocery_catalog_cache_hits', 'Catalog cache hits since start.', cache['hits']),
+        ('grocery_catalog_cache_misses', 'Catalog cache misses since start.', cache['misses']),
+        ('grocery_catalog_cache_entries', 'Entries currently in the catalog cache.', cache['entries']),
+    )
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+# -------------------- HTTP Caching --------------------
+def is_shareable_request():
+    """Anonymous requests with no pending flash messages render the same for everyone"""
+    return 'user_id' not in session and '_flashes' not in session
+
+def make_etag(*parts):
+    return hashlib.sha1('|'.join(str(p) for p in parts).encode()).hexdigest()
+
+def not_modified(etag, last_modified=None):
+    """Return a bare 304 if the client's validators still match, else None"""
+    if request.if_none_match:
+        fresh = request.if_none_match.contains(etag)
+    elif request.if_modified_since and last_modified:
+        fresh = last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= request.if_modified_since
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    response = Response(status=304)
+    return cache_headers(response, etag, last_modified)
+
+def cache_headers(response, etag=None, last_modified=None):
+    """Attach validators and a public Cache-Control policy so a CDN can serve the page"""
+    response = app.make_response(response)
+    if etag:
+        response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config['CATALOG_MAX_AGE']
+    return response
+
+def private_cache_headers(response):
+    """Per-user pages must not be stored by shared caches"""
+    response = app.make_response(response)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+# -------------------- Static Assets --------------------
+STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Pre-compressed variants written by build.py, best first
+STATIC_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+class AssetManifest:
+    """Original -> content-hashed static paths from build.py's manifest.json.
+
+    Loaded once per process; without a manifest (plain development checkout)
+    every lookup falls through to the original file name.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._files = None
+        self._hashed = frozenset()
+
+    def load(self):
+        if self._files is None:
+            try:
+                with open(self.path) as f:
+                    files = json.load(f)
+            except (OSError, ValueError):
+                files = {}
+            self._hashed = frozenset(files.values())
+            self._files = files
+        return self._files
+
+    def get(self, filename):
+        return self.load().get(filename, filename)
+
+    def is_fingerprinted(self, filename):
+        self.load()
+        return filename in self._hashed
+
+asset_manifest = AssetManifest(os.path.join(app.static_folder, app.config['ASSET_MANIFEST']))
+
+@app.url_defaults
+def fingerprint_static_url(endpoint, values):
+    """url_for('static', filename='css/styles.css') -> the hashed name from the manifest"""
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = asset_manifest.get(values['filename'])
+
+def serve_static(filename):
+    """Flask's static view, plus build.py's .br/.gz variants and long-lived caching for hashed files.
+
+    A fingerprinted URL changes whenever its content does, so browsers may keep
+    it forever and never revalidate.
+    """
+    if not asset_manifest.is_fingerprinted(filename):
+        return app.send_static_file(filename)
+    response = None
+    for encoding, suffix in STATIC_ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.isfile(os.path.join(app.static_folder, filename + suffix)):
+            response = send_from_directory(app.static_folder, filename + suffix,
+                                           mimetype=mimetypes.guess_type(filename)[0])
+            response.content_encoding = encoding
+            break
+    if response is None:
+        response = app.send_static_file(filename)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.max_age = STATIC_IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    response.cache_control.no_cache = None
+    return response
+
+app.view_functions['static'] = serve_static
+
 # -------------------- Helpers --------------------
 def get_cart():
-    return session.get('cart', {})
+    """The current cart, loaded from the cart store at most once per request"""
+    if 'cart' not in g:
+        g.cart, g.cart_json = {}, '{}'
+        ref = session.get('cart_ref')
+        if ref:
+            data = cart_store.load(*ref)
+            if data is not None:
+                g.cart, g.cart_json = json.loads(data), data
+        if 'cart' in session:
+            # Carry over carts from the old cookie-based sessions
+            save_cart(session.pop('cart'))
+    return g.cart
 
 def save_cart(cart):
-    session['cart'] = cart
-    session.modified = True
+    """Persist the cart server-side; unchanged carts are not rewritten"""
+    get_cart()
+    g.cart = cart
+    data = json.dumps(cart, sort_keys=True)
+    if data == g.cart_json:
+        return
+    ref = session.get('cart_ref')
+    sid = ref[0] if ref else uuid.uuid4().hex
+    session['cart_ref'] = [sid, cart_store.save(sid, data)]
+    g.cart_json = data
 
-def cart_items_details():
-    cart = get_cart()
+@app.context_processor
+def inject_cart_count():
+    if 'cart_ref' not in session and 'cart' not in session:
+        return {'cart_count': 0}
+    return {'cart_count': len(get_cart())}
+
+def price_cart(cart):
+    """Price a cart dict of {product_id: qty} with a single IN (...) query"""
     items = []
     total = 0.0
+    if not cart:
+        return items, total
+    ids = [int(pid) for pid in cart]
+    products = {p.id: p for p in Product.query.filter(Product.id.in_(ids)).all()}
     for pid, qty in cart.items():
-        product = Product.query.get(int(pid))
+        product = products.get(int(pid))
         if not product:
             continue
         subtotal = product.price * qty
@@ -234,15 +1233,1303 @@ def cart_items_details():
         items.append({'product': product, 'qty': qty, 'subtotal': subtotal})
     return items, total
 
+def cart_items_details():
+    return price_cart(get_cart())
+
 def get_wishlist_products(user_id):
-    """Get all products in user's wishlist"""
-    wishlist_items = Wishlist.query.filter_by(user_id=user_id).all()
-    products = []
-    for item in wishlist_items:
-        product = Product.query.get(item.product_id)
-        if product:
-            products.append(product)
-    return products
+    """Get all products in user's wishlist with a single joined query"""
+    return (Product.query
+            .join(Wishlist, Wishlist.product_id == Product.id)
+            .filter(Wishlist.user_id == user_id)
+            .order_by(Wishlist.created_at)
+            .all())
+
+WISHLIST_BULK_LIMIT = 1000
+
+def requested_product_ids():
+    """Product ids from a JSON body ({"product_ids": [...]}) or repeated product_ids form fields"""
+    if request.is_json:
+        raw = (request.get_json(silent=True) or {}).get('product_ids', [])
+    else:
+        raw = request.form.getlist('product_ids')
+    if not isinstance(raw, list):
+        raise APIError('product_ids must be a list.')
+    try:
+        ids = list(dict.fromkeys(int(pid) for pid in raw))
+    except (TypeError, ValueError):
+        raise APIError('product_ids must be integers.')
+    if len(ids) > WISHLIST_BULK_LIMIT:
+        raise APIError(f'At most {WISHLIST_BULK_LIMIT} products per request.')
+    return ids
+
+def wants_json():
+    return request.is_json or request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
+# -------------------- Shared Cart Store --------------------
+class LazySweeper:
+    """Run a purge function at most once per interval, piggybacking on normal writes"""
+
+    def __init__(self, purge, interval):
+        self.purge = purge
+        self.interval = interval
+        self._next_run = 0.0
+        self._lock = threading.Lock()
+
+    def maybe_run(self):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_run:
+                return
+            self._next_run = now + self.interval
+        self.purge()
+
+class DatabaseSharedCartStore:
+    """Shared carts persisted in the SharedCart table so every worker can resolve them"""
+
+    def __init__(self, ttl, purge_interval):
+        self.ttl = timedelta(seconds=ttl)
+        self.sweeper = LazySweeper(self.purge_expired, purge_interval)
+
+    def save(self, token, cart):
+        self.sweeper.maybe_run()
+        db.session.add(SharedCart(token=token, cart_data=json.dumps(cart)))
+        db.session.commit()
+
+    def load(self, token):
+        """One lookup on the unique token index; returns (cart, expires_at) or None"""
+        row = db.session.query(SharedCart.cart_data, SharedCart.created_at).filter_by(token=token).first()
+        if not row:
+            return None
+        expires_at = row.created_at + self.ttl
+        if expires_at <= datetime.utcnow():
+            return None
+        return json.loads(row.cart_data), expires_at
+
+    def purge_expired(self):
+        cutoff = datetime.utcnow() - self.ttl
+        deleted = SharedCart.query.filter(SharedCart.created_at < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+class CachedSharedCartStore:
+    """Bounded LRU of recently shared carts in front of another store"""
+
+    def __init__(self, backend, max_entries):
+        self.backend = backend
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, token, value):
+        with self._lock:
+            self._entries[token] = value
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def save(self, token, cart):
+        self.backend.save(token, cart)
+        self._remember(token, (dict(cart), datetime.utcnow() + self.backend.ttl))
+
+    def load(self, token):
+        with self._lock:
+            value = self._entries.get(token)
+            if value:
+                self._entries.move_to_end(token)
+        if value and value[1] <= datetime.utcnow():
+            with self._lock:
+                self._entries.pop(token, None)
+            return None
+        if not value:
+            value = self.backend.load(token)
+            if value:
+                self._remember(token, value)
+        return value
+
+    def purge_expired(self):
+        with self._lock:
+            self._entries.clear()
+        return self.backend.purge_expired()
+
+def make_shared_cart_store():
+    store = DatabaseSharedCartStore(app.config['SHARED_CART_TTL'], app.config['SHARED_CART_PURGE_INTERVAL'])
+    if app.config['SHARED_CART_CACHE_SIZE'] > 0:
+        store = CachedSharedCartStore(store, app.config['SHARED_CART_CACHE_SIZE'])
+    return store
+
+shared_cart_store = make_shared_cart_store()
+
+# -------------------- Server-side Carts --------------------
+class CartStore:
+    """CartSession table with an in-memory hot tier.
+
+    Every write gets a fresh version that is also stored in the user's
+    cookie, so a hot-tier entry is only trusted when its version matches the
+    cookie. A cart changed by another worker simply misses and is reloaded.
+    """
+
+    def __init__(self, max_entries, ttl, purge_interval):
+        self.max_entries = max_entries
+        self.ttl = timedelta(seconds=ttl)
+        # Abandoned carts are swept lazily when a new cart is created
+        self.sweeper = LazySweeper(self.purge_expired, purge_interval)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, sid, version, data):
+        with self._lock:
+            self._entries[sid] = (version, data)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def load(self, sid, version):
+        """Return the cart's JSON, or None if it no longer exists"""
+        with self._lock:
+            hot = self._entries.get(sid)
+            if hot and hot[0] == version:
+                self._entries.move_to_end(sid)
+                return hot[1]
+        row = db.session.query(CartSession.version, CartSession.cart_data).filter_by(id=sid).first()
+        if not row:
+            return None
+        self._remember(sid, row.version, row.cart_data)
+        return row.cart_data
+
+    def save(self, sid, data):
+        """Write the cart's JSON and return its new version"""
+        version = uuid.uuid4().hex[:16]
+        now = datetime.utcnow()
+        updated = db.session.execute(
+            CartSession.__table__.update().where(CartSession.id == sid)
+            .values(version=version, cart_data=data, updated_at=now)
+        ).rowcount
+        if not updated:
+            self.sweeper.maybe_run()
+            db.session.add(CartSession(id=sid, version=version, cart_data=data, updated_at=now))
+        db.session.commit()
+        self._remember(sid, version, data)
+        return version
+
+    def purge_expired(self):
+        cutoff = datetime.utcnow() - self.ttl
+        deleted = CartSession.query.filter(CartSession.updated_at < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+cart_store = CartStore(app.config['CART_CACHE_SIZE'], app.config['CART_TTL'], app.config['SHARED_CART_PURGE_INTERVAL'])
+
+# -------------------- Shared Wishlists --------------------
+SharedWishlistView = namedtuple('SharedWishlistView', ['owner_name', 'created_at', 'expires_at', 'products'])
+
+def purge_expired_shared_wishlists():
+    """Delete expired share links using the expires_at index"""
+    deleted = SharedWishlist.query.filter(SharedWishlist.expires_at < datetime.utcnow()).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+shared_wishlist_sweeper = LazySweeper(purge_expired_shared_wishlists, app.config['SHARED_CART_PURGE_INTERVAL'])
+
+def load_shared_wishlist(token):
+    """Resolve a share token and its products with one batched query, cached per catalog version.
+
+    Unknown tokens are not cached, so requests for random tokens can't push
+    catalog entries out of the cache.
+    """
+    def load():
+        shared = SharedWishlist.query.filter_by(token=token).first()
+        if not shared:
+            raise LookupError(token)
+        wishlist_data = json.loads(shared.wishlist_data)
+        ids = [info['id'] for info in wishlist_data['products']]
+        found = {p.id: snapshot_product(p) for p in Product.query.filter(Product.id.in_(ids)).all()} if ids else {}
+        return SharedWishlistView(
+            wishlist_data['user_name'],
+            shared.created_at,
+            shared.expires_at,
+            tuple(found[pid] for pid in ids if pid in found)
+        )
+    try:
+        view = catalog_cache.get(('shared_wishlist', token), load)
+    except LookupError:
+        return None
+    if view.expires_at and view.expires_at <= datetime.utcnow():
+        return None
+    return view
+
+# -------------------- Background Jobs --------------------
+JOB_HANDLERS = {}
+
+metrics.describe('grocery_jobs_total', 'counter', 'Background jobs run, by kind and outcome.')
+metrics.describe('grocery_job_duration_seconds', 'histogram', 'Background job run time.')
+
+def job_handler(kind):
+    """Register a function as the handler for a job kind.
+
+    Jobs run at least once: a worker that dies mid-job loses its lease and
+    the job runs again, so handlers must be safe to repeat.
+    """
+    def register(f):
+        JOB_HANDLERS[kind] = f
+        return f
+    return register
+
+def enqueue_job(kind, payload=None, key=None, delay=0, max_attempts=None):
+    """Add a job to the current transaction; it becomes visible to workers when the caller commits.
+
+    A job whose idempotency key already exists is silently skipped.
+    """
+    row = {
+        'kind': kind,
+        'payload': json.dumps(payload or {}),
+        'idempotency_key': key,
+        'status': 'queued',
+        'attempts': 0,
+        'max_attempts': max_attempts or app.config['JOB_MAX_ATTEMPTS'],
+        'run_at': datetime.utcnow() + timedelta(seconds=delay),
+        'created_at': datetime.utcnow(),
+    }
+    insert = dialect_insert()
+    if insert is not None and key:
+        db.session.execute(insert(Job.__table__).on_conflict_do_nothing(index_elements=['idempotency_key']), [row])
+    elif not key or db.session.scalar(db.select(Job.id).where(Job.idempotency_key == key)) is None:
+        db.session.execute(db.insert(Job), [row])
+
+def job_claimable(now):
+    """Due jobs that are queued, or running on a lease that has expired (its worker died)"""
+    return and_(Job.run_at <= now, or_(
+        Job.status == 'queued',
+        and_(Job.status == 'running', Job.locked_until < now),
+    ))
+
+def claim_jobs(limit):
+    """Lease up to `limit` due jobs for this worker; returns [(id, token)]"""
+    now = datetime.utcnow()
+    ids = list(db.session.scalars(
+        db.select(Job.id).where(job_claimable(now)).order_by(Job.run_at, Job.id).limit(limit)
+    ))
+    if not ids:
+        db.session.rollback()
+        return []
+    token = uuid.uuid4().hex
+    # Re-check the condition in the UPDATE so two workers racing for a job can't both win it
+    db.session.execute(
+        db.update(Job).where(Job.id.in_(ids), job_claimable(now))
+        .values(status='running', claimed_by=token, attempts=Job.attempts + 1,
+                locked_until=now + timedelta(seconds=app.config['JOB_LEASE_SECONDS']))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    claimed = db.session.scalars(db.select(Job.id).where(Job.claimed_by == token, Job.status == 'running'))
+    return [(job_id, token) for job_id in claimed]
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter, capped at JOB_RETRY_MAX seconds"""
+    delay = min(app.config['JOB_RETRY_BASE'] * 2 ** (attempts - 1), app.config['JOB_RETRY_MAX'])
+    return delay * random.uniform(0.5, 1.0)
+
+def finish_job(job_id, token, **values):
+    """Record a job's outcome, unless its lease was lost and another worker now owns it"""
+    db.session.execute(
+        db.update(Job).where(Job.id == job_id, Job.claimed_by == token)
+        .values(claimed_by=None, locked_until=None, **values)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+def run_job(job_id, token):
+    """Run one claimed job and record its outcome; returns 'done', 'retry' or 'failed'"""
+    job = db.session.get(Job, job_id)
+    kind, payload, attempts, max_attempts = job.kind, json.loads(job.payload), job.attempts, job.max_attempts
+    db.session.rollback()
+    start = time.perf_counter()
+    try:
+        handler = JOB_HANDLERS.get(kind)
+        if handler is None:
+            raise LookupError(f'No handler registered for {kind}')
+        handler(payload)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.warning('Job %s (%s) failed on attempt %d: %s', job_id, kind, attempts, e)
+        if attempts < max_attempts:
+            outcome = 'retry'
+            finish_job(job_id, token, status='queued', last_error=repr(e),
+                       run_at=datetime.utcnow() + timedelta(seconds=retry_delay(attempts)))
+        else:
+            outcome = 'failed'
+            finish_job(job_id, token, status='failed', last_error=repr(e), finished_at=datetime.utcnow())
+    else:
+        outcome = 'done'
+        finish_job(job_id, token, status='done', last_error=None, finished_at=datetime.utcnow())
+    metrics.inc('grocery_jobs_total', (('kind', kind), ('outcome', outcome)))
+    metrics.observe('grocery_job_duration_seconds', (('kind', kind),), time.perf_counter() - start)
+    return outcome
+
+def purge_finished_jobs():
+    cutoff = datetime.utcnow() - timedelta(seconds=app.config['JOB_RETENTION'])
+    deleted = Job.query.filter(Job.status == 'done', Job.finished_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+class JobWorker:
+    """Claims due jobs from the Job table and runs them on a thread pool.
+
+    Any number of workers, in web processes or a separate `flask worker`,
+    can share one queue; leases keep them from running the same job twice.
+    """
+
+    def __init__(self, threads, poll_interval):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.sweeper = LazySweeper(purge_finished_jobs, app.config['SHARED_CART_PURGE_INTERVAL'])
+        self._pool = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._slots = threading.Semaphore(threads)
+
+    def run_pending(self, limit=None):
+        """Claim and run due jobs in the calling thread until none are left; returns how many ran"""
+        ran = 0
+        with app.app_context():
+            while limit is None or ran < limit:
+                claimed = claim_jobs(1)
+                if not claimed:
+                    break
+                run_job(*claimed[0])
+                ran += 1
+        return ran
+
+    def start(self):
+        if self._thread is None:
+            self._pool = ThreadPoolExecutor(self.threads, thread_name_prefix='job')
+            self._thread = threading.Thread(target=self._dispatch, name='job-dispatcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, wait=True):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._pool.shutdown(wait=wait)
+            self._thread = self._pool = None
+        self._stop.clear()
+
+    def _run(self, job_id, token):
+        try:
+            with app.app_context():
+                run_job(job_id, token)
+        except Exception:
+            app.logger.exception('Job worker crashed running job %s', job_id)
+        finally:
+            self._slots.release()
+
+    def _dispatch(self):
+        while not self._stop.is_set():
+            # Wait for a free thread, then take every other one that is idle too
+            if not self._slots.acquire(timeout=self.poll_interval):
+                continue
+            free = 1
+            while free < self.threads and self._slots.acquire(blocking=False):
+                free += 1
+            claimed = []
+            try:
+                with app.app_context():
+                    self.sweeper.maybe_run()
+                    claimed = claim_jobs(free)
+            except SQLAlchemyError:
+                app.logger.exception('Could not claim jobs')
+            for job_id, token in claimed:
+                self._pool.submit(self._run, job_id, token)
+            for _ in range(free - len(claimed)):
+                self._slots.release()
+            if not claimed:
+                self._stop.wait(self.poll_interval)
+
+job_worker = JobWorker(app.config['JOB_WORKER_THREADS'] or 1, app.config['JOB_POLL_INTERVAL'])
+
+# -------------------- Product Images --------------------
+# Fixed variant sizes; the same boxes the templates' placeholder images use
+IMAGE_SIZES = {'thumb': (120, 80), 'card': (300, 200), 'detail': (600, 400)}
+IMAGE_FORMATS = {'webp': ('WEBP', 'image/webp'), 'jpeg': ('JPEG', 'image/jpeg')}
+IMAGE_MAX_AGE = 365 * 24 * 3600
+IMAGE_DIGEST_RE = re.compile(r'[0-9a-f]{64}')
+
+def sniff_image_type(data):
+    """Mimetype from the file's magic bytes, or None if it is not an image we serve"""
+    if data.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+class ImageFetchError(Exception):
+    """The remote image could not be fetched or is not an image"""
+
+class HTTPImageFetcher:
+    """Download an image over http(s), refusing private addresses unless allowed.
+
+    Anything with a fetch(url) -> bytes method can replace it on image_store,
+    e.g. a stub that reads from a local test server or fixture directory.
+    """
+
+    def __init__(self, timeout, max_bytes, allow_private=False):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.allow_private = allow_private
+
+    def resolve(self, host, port):
+        """Look the host up once and return the (ip, port) to connect to, refusing private addresses"""
+        try:
+            infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except OSError as e:
+            raise ImageFetchError(f'Could not resolve {host}: {e}') from e
+        if not self.allow_private:
+            for info in infos:
+                address = ipaddress.ip_address(info[4][0])
+                address = getattr(address, 'ipv4_mapped', None) or address
+                # is_global also rules out shared (carrier-grade NAT) space such as 100.100.100.200
+                if not address.is_global or address.is_multicast or address.is_unspecified:
+                    raise ImageFetchError(f'{host} resolves to a private address')
+        return infos[0][4][0], port
+
+    def check_url(self, url):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ImageFetchError(f'Unsupported image URL: {url}')
+
+    def fetch(self, url):
+        fetcher = self
+
+        class CheckedRedirects(urllib.request.HTTPRedirectHandler):
+            def redirect_request(self, req, fp, code, msg, headers, newurl):
+                fetcher.check_url(newurl)
+                return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+        # Each connection (redirects included) resolves the host once, checks the answer and
+        # connects to that address, so a second DNS lookup can't swap in an internal host.
+        # The Host header and the TLS certificate check still use the hostname.
+        class PinnedHTTPConnection(http.client.HTTPConnection):
+            def connect(self):
+                self.sock = socket.create_connection(fetcher.resolve(self.host, self.port), self.timeout)
+
+        class PinnedHTTPSConnection(http.client.HTTPSConnection, PinnedHTTPConnection):
+            pass
+
+        class PinnedHTTPHandler(urllib.request.HTTPHandler):
+            def http_open(self, req):
+                return self.do_open(PinnedHTTPConnection, req)
+
+        class PinnedHTTPSHandler(urllib.request.HTTPSHandler):
+            def https_open(self, req):
+                return self.do_open(PinnedHTTPSConnection, req, context=ssl.create_default_context())
+
+        self.check_url(url)
+        # No proxies: a proxy would do its own lookup and defeat the pinning
+        opener = urllib.request.build_opener(
+            urllib.request.ProxyHandler({}), CheckedRedirects, PinnedHTTPHandler, PinnedHTTPSHandler,
+        )
+        req = urllib.request.Request(url, headers={'User-Agent': 'GroceryStore-ImageProxy/1.0'})
+        try:
+            with opener.open(req, timeout=self.timeout) as response:
+                data = response.read(self.max_bytes + 1)
+        except (OSError, ValueError) as e:
+            raise ImageFetchError(f'Could not fetch {url}: {e}') from e
+        if len(data) > self.max_bytes:
+            raise ImageFetchError(f'{url} is larger than {self.max_bytes} bytes')
+        return data
+
+class ImageStore:
+    """Content-addressed originals and their resized variants on local disk.
+
+        originals/ab/<sha256>              the fetched bytes, as served by the remote host
+        variants/ab/<sha256>/<size>.<fmt>  fixed-size crops, made with Pillow when installed
+
+    Files are written to a temp name and renamed, so readers never see partial files.
+    """
+
+    def __init__(self, root, fetcher):
+        self.root = root
+        self.fetcher = fetcher
+
+    def original_path(self, digest):
+        return os.path.join(self.root, 'originals', digest[:2], digest)
+
+    def variant_path(self, digest, size, fmt):
+        return os.path.join(self.root, 'variants', digest[:2], digest, f'{size}.{fmt}')
+
+    def write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def save_original(self, data):
+        if sniff_image_type(data) is None:
+            raise ImageFetchError('Response is not a JPEG, PNG, GIF or WebP image')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.original_path(digest)
+        if not os.path.exists(path):
+            self.write(path, data)
+        return digest
+
+    def render_variant(self, digest, size, fmt):
+        """Crop and scale the original to one fixed size; returns the variant's path"""
+        width, height = IMAGE_SIZES[size]
+        with Image.open(self.original_path(digest)) as image:
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGBA' if fmt == 'webp' and image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+            image = ImageOps.fit(image, (width, height), Image.LANCZOS)
+            out = io.BytesIO()
+            if fmt == 'webp':
+                image.save(out, 'WEBP', quality=80, method=4)
+            else:
+                image.save(out, 'JPEG', quality=82, optimize=True, progressive=True)
+        path = self.variant_path(digest, size, fmt)
+        self.write(path, out.getvalue())
+        return path
+
+    def make_variants(self, digest):
+        if Image is None:
+            return
+        for size in IMAGE_SIZES:
+            for fmt in IMAGE_FORMATS:
+                if not os.path.exists(self.variant_path(digest, size, fmt)):
+                    self.render_variant(digest, size, fmt)
+
+    def variant(self, digest, size, fmt):
+        """(path, mimetype) to serve, rendering a missing variant on the spot; None if unknown.
+
+        Without Pillow the original is served for every size.
+        """
+        original = self.original_path(digest)
+        if not os.path.exists(original):
+            return None
+        if Image is None:
+            with open(original, 'rb') as f:
+                return original, sniff_image_type(f.read(16))
+        path = self.variant_path(digest, size, fmt)
+        if not os.path.exists(path):
+            path = self.render_variant(digest, size, fmt)
+        return path, IMAGE_FORMATS[fmt][1]
+
+image_store = ImageStore(app.config['IMAGE_DIR'], HTTPImageFetcher(
+    app.config['IMAGE_FETCH_TIMEOUT'], app.config['IMAGE_MAX_BYTES'], app.config['IMAGE_ALLOW_PRIVATE'],
+))
+
+class ImageIndex:
+    """In-process map of source URL -> content hash for images that are ready locally.
+
+    Reloaded from ImageAsset every `ttl` seconds so other workers' fetches show
+    up; version changes whenever the map does, for cache keys built from it.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.version = 0
+        self._urls = {}
+        self._expires = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        if time.monotonic() >= self._expires:
+            self.reload()
+        return self._urls.get(url)
+
+    def reload(self):
+        rows = db.session.execute(
+            db.select(ImageAsset.source_url, ImageAsset.content_hash).where(ImageAsset.status == 'ready')
+        ).all()
+        urls = {url: digest for url, digest in rows}
+        with self._lock:
+            if urls != self._urls:
+                self._urls = urls
+                self.version += 1
+            self._expires = time.monotonic() + self.ttl
+
+    def add(self, url, digest):
+        with self._lock:
+            self._urls = dict(self._urls, **{url: digest})
+            self.version += 1
+
+image_index = ImageIndex(app.config['CATALOG_CACHE_TTL'])
+
+def queue_image_fetches(urls):
+    """Queue a one-time fetch for each new remote image URL, in the caller's transaction"""
+    urls = {u for u in urls if u and u.startswith(('http://', 'https://'))}
+    if not urls:
+        return 0
+    known = set(db.session.scalars(
+        db.select(ImageAsset.source_url).where(ImageAsset.source_url.in_(bindparam('urls', expanding=True))),
+        {'urls': list(urls)},
+    ))
+    new = sorted(urls - known)
+    if new:
+        db.session.execute(db.insert(ImageAsset), [{'source_url': u, 'status': 'pending'} for u in new])
+    for url in new:
+        enqueue_job('image.fetch', {'url': url}, key=f'image-fetch:{hashlib.sha1(url.encode()).hexdigest()}')
+    return len(new)
+
+@job_handler('image.fetch')
+def fetch_product_image(payload):
+    """Fetch one image, store it by content hash and pre-render every variant"""
+    asset = db.session.scalar(db.select(ImageAsset).where(ImageAsset.source_url == payload['url']))
+    if asset is None:
+        return
+    if asset.status == 'ready' and os.path.exists(image_store.original_path(asset.content_hash)):
+        digest = asset.content_hash
+    else:
+        digest = image_store.save_original(image_store.fetcher.fetch(asset.source_url))
+    image_store.make_variants(digest)
+    asset.content_hash = digest
+    asset.status = 'ready'
+    asset.fetched_at = datetime.utcnow()
+    db.session.commit()
+    image_index.add(asset.source_url, digest)
+
+@app.template_global()
+def product_image(url, size='card'):
+    """Local /img URL for a product image once it has been fetched, else the original URL"""
+    digest = image_index.get(url) if url else None
+    if digest is None:
+        return url
+    return url_for('product_image_file', digest=digest, size=size)
+
+@app.route('/img/<digest>/<size>')
+def product_image_file(digest, size):
+    if not IMAGE_DIGEST_RE.fullmatch(digest) or size not in IMAGE_SIZES:
+        abort(404)
+    fmt = 'webp' if request.accept_mimetypes['image/webp'] else 'jpeg'
+    found = image_store.variant(digest, size, fmt)
+    if found is None:
+        abort(404)
+    path, mimetype = found
+    response = send_file(path, mimetype=mimetype, conditional=True)
+    # The URL names the content hash, so it can be cached forever
+    response.vary.add('Accept')
+    response.cache_control.public = True
+    response.cache_control.max_age = IMAGE_MAX_AGE
+    response.cache_control.immutable = True
+    response.cache_control.no_cache = None
+    return response
+
+# -------------------- Order Placement --------------------
+class OrderError(Exception):
+    """The order could not be placed and nothing was written"""
+
+class OutOfStockError(OrderError):
+    def __init__(self, product_names):
+        self.product_names = product_names
+        super().__init__(f"Not enough stock for: {', '.join(product_names)}")
+
+# Only succeeds when enough stock is left, so concurrent checkouts can't oversell.
+# updated_at is left alone: a stock change is not a catalog edit and must not move the catalog ETags.
+RESERVE_STOCK = (
+    Product.__table__.update()
+    .where(Product.id == bindparam('pid'))
+    .where(Product.stock >= bindparam('qty'))
+    .values(stock=Product.stock - bindparam('qty'), updated_at=Product.updated_at)
+    .execution_options(stock_only=True)
+)
+
+def reserve_stock(lines):
+    """Decrement stock for every line; returns how many lines were reserved"""
+    if db.session.get_bind().dialect.supports_sane_multi_rowcount:
+        return db.session.execute(RESERVE_STOCK, lines).rowcount
+    # executemany can't report per-row matches here, so run each line once and count them
+    return sum(db.session.execute(RESERVE_STOCK, line).rowcount for line in lines)
+
+def place_order(items, customer_name, customer_email, address, donation_amount=0.0, charity_name=''):
+    """Reserve stock and write the order with all of its items in one transaction"""
+    lines = [{'pid': it['product'].id, 'qty': it['qty']} for it in items]
+    total = sum(it['subtotal'] for it in items)
+    try:
+        if reserve_stock(lines) != len(lines):
+            db.session.rollback()
+            short = Product.query.filter(Product.id.in_([l['pid'] for l in lines])).all()
+            wanted = {l['pid']: l['qty'] for l in lines}
+            raise OutOfStockError([p.name for p in short if p.stock < wanted[p.id]] or ['unknown product'])
+        order = Order(
+            customer_name=customer_name,
+            customer_email=customer_email,
+            address=address,
+            total_amount=total + donation_amount,
+            donation_amount=donation_amount,
+            charity_name=charity_name
+        )
+        db.session.add(order)
+        db.session.flush()
+        order_items = [{
+            'order_id': order.id,
+            'product_id': it['product'].id,
+            'quantity': it['qty'],
+            'unit_price': it['product'].price,
+        } for it in items]
+        db.session.execute(db.insert(OrderItem), order_items)
+        record_order_sales(order, order_items)
+        enqueue_order_jobs(order)
+        # Only the ordered products' snapshots and the stock validator change; listings and search stay cached
+        stale = db.session.info.setdefault('catalog_stale', set())
+        stale.update(('product', l['pid']) for l in lines)
+        stale.add('stock_state')
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        raise OrderError('The store is busy, please try again.') from e
+    return order
+
+# -------------------- Sales Analytics --------------------
+SALES_WATERMARK = 'orders'
+ANALYTICS_MAX_DAYS = 366
+ANALYTICS_TOP_LIMIT = 50
+
+def advance_watermark(expected, new, name=SALES_WATERMARK):
+    """Move an order watermark from expected to new; False if another writer got there first.
+
+    Every rollup write starts with this conditional UPDATE, so it doubles as
+    the lock that keeps each order from being counted twice.
+    """
+    result = db.session.execute(
+        db.update(RollupWatermark)
+        .where(RollupWatermark.name == name, RollupWatermark.last_id == expected)
+        .values(last_id=new)
+    )
+    return result.rowcount == 1
+
+def dialect_insert():
+    """The insert() construct with ON CONFLICT support for the current database, or None"""
+    return {'sqlite': sqlite_insert, 'postgresql': postgresql_insert}.get(db.session.get_bind().dialect.name)
+
+def bump_rollup(model, key, rows):
+    """Add each row's deltas to its rollup row with a single executemany upsert.
+
+    rows map a key value to {column: delta}; every row must carry the same columns.
+    A composite key is a tuple of column names, with the rows keyed by tuples.
+    """
+    if not rows:
+        return
+    keys = key if isinstance(key, tuple) else (key,)
+    def key_values(value):
+        return dict(zip(keys, value if isinstance(key, tuple) else (value,)))
+    insert = dialect_insert()
+    if insert is None:
+        # No portable upsert: update, then insert the keys that were not there yet
+        for value, deltas in rows.items():
+            match = key_values(value)
+            updated = db.session.execute(db.update(model).where(*(getattr(model, k) == v for k, v in match.items()))
+                                         .values({name: getattr(model, name) + delta for name, delta in deltas.items()}))
+            if updated.rowcount == 0:
+                db.session.execute(db.insert(model).values({**match, **deltas}))
+        return
+    columns = list(next(iter(rows.values())))
+    stmt = insert(model.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: getattr(model.__table__.c, name) + getattr(stmt.excluded, name) for name in columns},
+    )
+    db.session.execute(stmt, [{**key_values(value), **deltas} for value, deltas in rows.items()])
+
+def apply_sales_rollup(orders, items):
+    """Fold a batch of orders and their items into the daily, product and charity rollups.
+
+    orders are (id, created_at, total_amount, donation_amount, charity_name)
+    tuples and items are (order_id, product_id, quantity, unit_price).
+    """
+    days, products, charities = {}, {}, {}
+    order_days = {}
+    for order_id, created_at, total, donation, charity in orders:
+        day = (created_at or datetime.utcnow()).date()
+        order_days[order_id] = day
+        donation = donation or 0.0
+        row = days.setdefault(day, {'orders': 0, 'items_sold': 0, 'revenue': 0.0, 'donations': 0.0})
+        row['orders'] += 1
+        row['revenue'] += total - donation
+        row['donations'] += donation
+        if donation > 0 and charity:
+            row = charities.setdefault(charity, {'donations': 0, 'amount': 0.0})
+            row['donations'] += 1
+            row['amount'] += donation
+    product_orders = set()
+    for order_id, product_id, quantity, unit_price in items:
+        quantity = quantity or 0
+        days[order_days[order_id]]['items_sold'] += quantity
+        row = products.setdefault(product_id, {'orders': 0, 'quantity': 0, 'revenue': 0.0})
+        if (order_id, product_id) not in product_orders:
+            product_orders.add((order_id, product_id))
+            row['orders'] += 1
+        row['quantity'] += quantity
+        row['revenue'] += quantity * unit_price
+    bump_rollup(DailySales, 'day', days)
+    bump_rollup(ProductSales, 'product_id', products)
+    bump_rollup(CharityDonation, 'charity_name', charities)
+
+def record_order_sales(order, items):
+    """Roll up a just-placed order inside its own transaction.
+
+    Only applies when the order is the next one after the watermark; any
+    gap (rollups switched on late, a deferred order) is left to the catch-up
+    job rather than risking a double count.
+    """
+    if not app.config['SALES_ROLLUP_INLINE'] or not advance_watermark(order.id - 1, order.id):
+        return False
+    apply_sales_rollup(
+        [(order.id, order.created_at, order.total_amount, order.donation_amount, order.charity_name)],
+        [(order.id, it['product_id'], it['quantity'], it['unit_price']) for it in items],
+    )
+    return True
+
+def sales_watermark(name=SALES_WATERMARK):
+    last_id = db.session.scalar(db.select(RollupWatermark.last_id).where(RollupWatermark.name == name))
+    if last_id is None:
+        db.session.add(RollupWatermark(name=name, last_id=0))
+        db.session.commit()
+        return 0
+    return last_id
+
+def catch_up_orders(name, order_columns, item_columns, apply, batch_size=None, max_batches=None, lag=None):
+    """Feed orders past the named watermark to apply(orders, items), one committed batch at a time.
+
+    Returns the number of orders processed. Safe to run alongside checkout:
+    a batch whose watermark moved underneath it is rolled back and re-read.
+    Order ids are handed out before commit, so a lower id can become visible
+    after a higher one; the watermark stops short of any order placed in the
+    last `lag` seconds (SALES_ROLLUP_LAG) to let such stragglers land first.
+    """
+    batch_size = batch_size or app.config['SALES_ROLLUP_BATCH']
+    lag = app.config['SALES_ROLLUP_LAG'] if lag is None else lag
+    processed = batches = 0
+    while max_batches is None or batches < max_batches:
+        last_id = sales_watermark(name)
+        pending = Order.id > last_id
+        if lag:
+            horizon = db.session.scalar(
+                db.select(db.func.min(Order.id))
+                .where(pending, Order.created_at > datetime.utcnow() - timedelta(seconds=lag))
+            )
+            if horizon is not None:
+                pending = and_(pending, Order.id < horizon)
+        orders = db.session.execute(
+            db.select(Order.id, *order_columns).where(pending).order_by(Order.id).limit(batch_size)
+        ).all()
+        if not orders:
+            break
+        items = db.session.execute(
+            db.select(OrderItem.order_id, *item_columns)
+            .where(OrderItem.order_id.between(orders[0].id, orders[-1].id))
+        ).all()
+        try:
+            if not advance_watermark(last_id, orders[-1].id, name):
+                db.session.rollback()
+                continue
+            apply(orders, items)
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            raise
+        processed += len(orders)
+        batches += 1
+    return processed
+
+def catch_up_sales_rollups(batch_size=None, max_batches=None, lag=None):
+    """Fold orders past the sales watermark into the rollups"""
+    return catch_up_orders(
+        SALES_WATERMARK,
+        (Order.created_at, Order.total_amount, Order.donation_amount, Order.charity_name),
+        (OrderItem.product_id, OrderItem.quantity, OrderItem.unit_price),
+        apply_sales_rollup, batch_size, max_batches, lag,
+    )
+
+sales_rollup_sweeper = LazySweeper(
+    lambda: catch_up_sales_rollups(max_batches=app.config['SALES_ROLLUP_MAX_BATCHES']),
+    app.config['SALES_ROLLUP_INTERVAL'],
+)
+
+def sales_pending():
+    """Orders placed but not yet rolled up; both lookups are primary-key reads"""
+    max_id = db.session.scalar(db.select(db.func.max(Order.id))) or 0
+    return max(max_id - sales_watermark(), 0)
+
+def sales_summary(days=30):
+    """Totals and a per-day series for the last `days` days, read only from DailySales"""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    rows = db.session.execute(
+        db.select(DailySales.day, DailySales.orders, DailySales.items_sold, DailySales.revenue, DailySales.donations)
+        .where(DailySales.day >= since).order_by(DailySales.day)
+    ).all()
+    series = [{
+        'day': r.day.isoformat(),
+        'orders': r.orders,
+        'items_sold': r.items_sold,
+        'revenue': round(r.revenue, 2),
+        'donations': round(r.donations, 2),
+    } for r in rows]
+    totals = {key: sum(r[key] for r in series) for key in ('orders', 'items_sold', 'revenue', 'donations')}
+    totals['revenue'] = round(totals['revenue'], 2)
+    totals['donations'] = round(totals['donations'], 2)
+    return {'days': days, 'since': since.isoformat(), 'totals': totals, 'daily': series}
+
+def top_products(by='quantity', limit=10):
+    """Best sellers straight off the ProductSales index, with names joined in"""
+    column = ProductSales.revenue if by == 'revenue' else ProductSales.quantity
+    rows = db.session.execute(
+        db.select(ProductSales.product_id, Product.name, ProductSales.orders, ProductSales.quantity, ProductSales.revenue)
+        .outerjoin(Product, Product.id == ProductSales.product_id)
+        .order_by(column.desc(), ProductSales.product_id).limit(limit)
+    ).all()
+    return [{
+        'product_id': r.product_id,
+        'name': r.name or f'Deleted product #{r.product_id}',
+        'orders': r.orders,
+        'quantity': r.quantity,
+        'revenue': round(r.revenue, 2),
+    } for r in rows]
+
+def charity_totals(limit=ANALYTICS_TOP_LIMIT):
+    rows = db.session.execute(
+        db.select(CharityDonation.charity_name, CharityDonation.donations, CharityDonation.amount)
+        .order_by(CharityDonation.amount.desc()).limit(limit)
+    ).all()
+    return [{'charity': r.charity_name, 'donations': r.donations, 'amount': round(r.amount, 2)} for r in rows]
+
+ROLLUP_JOB_MARGIN = 5  # seconds past SALES_ROLLUP_LAG before an order's rollup job runs
+
+def rollup_job_delay():
+    """Long enough for the job's order to have left the catch-up lag window"""
+    lag = app.config['SALES_ROLLUP_LAG']
+    return lag + ROLLUP_JOB_MARGIN if lag else 0
+
+def enqueue_order_jobs(order):
+    """Queue the post-order work in the order's own transaction, keyed so it is never queued twice"""
+    enqueue_job('order.confirmation_email', {'order_id': order.id}, key=f'order-confirmation:{order.id}')
+    enqueue_job('order.stock_check', {'order_id': order.id}, key=f'stock-check:{order.id}')
+    # Co-purchases are never counted at checkout, so every order needs a rollup job
+    enqueue_job('sales.rollup', {'order_id': order.id}, key=f'sales-rollup:{order.id}', delay=rollup_job_delay())
+
+def deliver_email(to, subject, body):
+    """Send through MAIL_SERVER when one is configured, otherwise just log the message"""
+    if not app.config['MAIL_SERVER']:
+        app.logger.info('Email to %s: %s', to, subject)
+        return
+    message = EmailMessage()
+    message['From'] = app.config['MAIL_SENDER']
+    message['To'] = to
+    message['Subject'] = subject
+    message.set_content(body)
+    with smtplib.SMTP(app.config['MAIL_SERVER'], app.config['MAIL_PORT'], timeout=10) as smtp:
+        smtp.send_message(message)
+
+def order_lines(order_id):
+    return db.session.execute(
+        db.select(Product.id, Product.name, Product.stock, OrderItem.quantity, OrderItem.unit_price)
+        .join(Product, Product.id == OrderItem.product_id)
+        .where(OrderItem.order_id == order_id)
+    ).all()
+
+@job_handler('order.confirmation_email')
+def send_order_confirmation(payload):
+    order = db.session.get(Order, payload['order_id'])
+    if order is None:
+        return
+    lines = [f'{l.quantity} x {l.name} @ ₹{l.unit_price:.2f}' for l in order_lines(order.id)]
+    if order.donation_amount:
+        lines.append(f'Donation to {order.charity_name}: ₹{order.donation_amount:.2f}')
+    body = '\n'.join([f'Hi {order.customer_name},', '', f'Thanks for your order #{order.id}.', ''] + lines +
+                     ['', f'Total: ₹{order.total_amount:.2f}', f'Delivering to: {order.address}'])
+    deliver_email(order.customer_email, f'Your Grocery Store order #{order.id}', body)
+
+@job_handler('order.stock_check')
+def check_order_stock(payload):
+    """Warn the admin about products this order left low or sold out"""
+    low = [l for l in order_lines(payload['order_id']) if (l.stock or 0) <= LOW_STOCK_THRESHOLD]
+    if not low:
+        return
+    report = '\n'.join(f'{l.name} (#{l.id}): {l.stock or 0} left' for l in low)
+    app.logger.warning('Low stock after order %s:\n%s', payload['order_id'], report)
+    if app.config['ADMIN_EMAIL']:
+        deliver_email(app.config['ADMIN_EMAIL'], f'Low stock: {len(low)} products', report)
+
+@job_handler('sales.rollup')
+def rollup_sales_job(payload):
+    """Catch up the sales rollups (a no-op if checkout already did) and the co-purchase rankings.
+
+    If the job's own order is still not counted (it is inside the lag window, or
+    behind a backlog longer than SALES_ROLLUP_MAX_BATCHES), queue another pass.
+    """
+    catch_up_sales_rollups(max_batches=app.config['SALES_ROLLUP_MAX_BATCHES'])
+    catch_up_recommendations(max_batches=app.config['SALES_ROLLUP_MAX_BATCHES'])
+    order_id = payload.get('order_id')
+    if order_id and min(sales_watermark(), sales_watermark(COPURCHASE_WATERMARK)) < order_id:
+        attempt = payload.get('pass', 0) + 1
+        enqueue_job('sales.rollup', {'order_id': order_id, 'pass': attempt},
+                    key=f'sales-rollup:{order_id}:{attempt}', delay=rollup_job_delay())
+
+# -------------------- Recommendations --------------------
+COPURCHASE_WATERMARK = 'copurchase'
+RECOMMENDATION_REFRESH_CHUNK = 500
+
+def apply_copurchases(orders, items):
+    """Count every ordered pair of distinct products sharing an order, then re-rank the products involved.
+
+    items are (order_id, product_id) rows. Baskets larger than
+    RECOMMENDATION_MAX_BASKET still count towards their products' order
+    totals but add no pairs: a bulk order says little about what goes
+    together and would add basket-size-squared rows.
+    """
+    baskets = {}
+    for order_id, product_id in items:
+        baskets.setdefault(order_id, set()).add(product_id)
+    pairs = Counter()
+    for basket in baskets.values():
+        pairs.update((pid, pid) for pid in basket)
+        if len(basket) <= app.config['RECOMMENDATION_MAX_BASKET']:
+            pairs.update(permutations(basket, 2))
+    bump_rollup(ProductPair, ('product_id', 'other_id'), {pair: {'orders': n} for pair, n in pairs.items()})
+    # Only the rows of products in these orders changed, so only their rankings can have moved
+    refresh_recommendations({pid for basket in baskets.values() for pid in basket})
+
+def refresh_recommendations(product_ids):
+    """Rebuild the stored top-K neighbours of the given products from ProductPair"""
+    product_ids = sorted(product_ids)
+    for start in range(0, len(product_ids), RECOMMENDATION_REFRESH_CHUNK):
+        chunk = product_ids[start:start + RECOMMENDATION_REFRESH_CHUNK]
+        totals = dict(db.session.execute(
+            db.select(ProductPair.product_id, ProductPair.orders)
+            .where(ProductPair.product_id.in_(chunk), ProductPair.other_id == ProductPair.product_id)
+        ).all())
+        ranked = db.select(
+            ProductPair.product_id, ProductPair.other_id, ProductPair.orders,
+            db.func.row_number().over(
+                partition_by=ProductPair.product_id,
+                order_by=(ProductPair.orders.desc(), ProductPair.other_id),
+            ).label('rank'),
+        ).where(ProductPair.product_id.in_(chunk), ProductPair.other_id != ProductPair.product_id).subquery()
+        rows = db.session.execute(
+            db.select(ranked).where(ranked.c.rank <= app.config['RECOMMENDATION_LIMIT'])
+        ).all()
+        db.session.execute(db.delete(ProductRecommendation).where(ProductRecommendation.product_id.in_(chunk)))
+        db.session.info.setdefault('catalog_stale', set()).update(('recommendations', pid) for pid in chunk)
+        if rows:
+            db.session.execute(db.insert(ProductRecommendation), [{
+                'product_id': r.product_id,
+                'rank': r.rank,
+                'other_id': r.other_id,
+                'score': r.orders / totals[r.product_id],
+            } for r in rows])
+
+def catch_up_recommendations(batch_size=None, max_batches=None, lag=None):
+    """Fold orders past the co-purchase watermark into ProductPair and the stored rankings"""
+    return catch_up_orders(COPURCHASE_WATERMARK, (), (OrderItem.product_id,), apply_copurchases,
+                           batch_size, max_batches, lag)
+
+def recommended_ids(pid):
+    """Products most often bought with pid: a primary-key range read of its stored ranking"""
+    return db.session.scalars(
+        db.select(ProductRecommendation.other_id)
+        .where(ProductRecommendation.product_id == pid).order_by(ProductRecommendation.rank)
+    ).all()
+
+def cart_recommended_ids(pids, limit=None):
+    """Products bought with anything in the cart, ranked by their summed scores, cart items excluded"""
+    if not pids:
+        return []
+    score = db.func.sum(ProductRecommendation.score)
+    return db.session.scalars(
+        db.select(ProductRecommendation.other_id)
+        .where(ProductRecommendation.product_id.in_(pids), ProductRecommendation.other_id.not_in(pids))
+        .group_by(ProductRecommendation.other_id)
+        .order_by(score.desc(), ProductRecommendation.other_id)
+        .limit(limit or app.config['RECOMMENDATION_LIMIT'])
+    ).all()
+
+def recommended_products(ids):
+    """Catalog snapshots for recommended ids, skipping deleted and sold-out products"""
+    products = (catalog_product(pid) for pid in ids)
+    return [p for p in products if p is not None and (p.stock or 0) > 0]
+
+def product_recommendations(pid):
+    """The resolved recommendations for one product page, cached until its ranking is recomputed.
+
+    A product elsewhere selling out only drops out of the list when the entry
+    expires (CATALOG_CACHE_TTL); checkout refuses it either way.
+    """
+    def load():
+        ids = recommended_ids(pid)
+        if not ids:
+            return []
+        found = {p.id: p for p in db.session.scalars(
+            db.select(Product).where(Product.id.in_(ids), Product.stock > 0)
+        )}
+        return [snapshot_product(found[i]) for i in ids if i in found]
+    return catalog_cache.get(('recommendations', pid), load)
+
+# -------------------- Catalog Import / Export --------------------
+IMPORT_BATCH_SIZE = 2000
+IMPORT_MAX_ERRORS = 1000
+EXPORT_FIELDS = ('id', 'name', 'description', 'price', 'image_url', 'category', 'stock')
+IMPORT_DEFAULTS = {
+    'description': '',
+    'image_url': Product.image_url.default.arg,
+    'category': 'General',
+    'stock': 100,
+}
+
+class ImportResult:
+    """Running totals for a bulk import; keeps only the first IMPORT_MAX_ERRORS errors"""
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({'row': line, 'error': message})
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
+
+def clean_import_row(raw):
+    """Validate one import record; returns the fields present in it or raises ValueError"""
+    if not isinstance(raw, dict):
+        raise ValueError('expected an object')
+    name = str(raw.get('name') or '').strip()
+    if not name:
+        raise ValueError('name is required')
+    if len(name) > 120:
+        raise ValueError('name is longer than 120 characters')
+    try:
+        price = float(raw.get('price'))
+    except (TypeError, ValueError):
+        raise ValueError('price must be a number')
+    if price < 0:
+        raise ValueError('price must not be negative')
+    row = {'name': name, 'price': price}
+    for field in ('description', 'image_url', 'category'):
+        if raw.get(field) not in (None, ''):
+            row[field] = str(raw[field]).strip()
+    # Same column limits as the admin edits, so one long value can't fail a whole batch
+    if len(row.get('image_url', '')) > 255:
+        raise ValueError('image_url is longer than 255 characters')
+    if 'category' in row:
+        row['category'] = row['category'][:80]
+    if raw.get('stock') not in (None, ''):
+        try:
+            row['stock'] = int(raw['stock'])
+        except (TypeError, ValueError):
+            raise ValueError('stock must be an integer')
+    return row
+
+def read_import_records(stream, fmt):
+    """Yield (line_number, record) from a text stream one row at a time; record is None if unparseable"""
+    if fmt == 'csv':
+        # Line 1 is the header
+        yield from enumerate(csv.DictReader(stream), start=2)
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError:
+            yield line_number, None
+
+def upsert_product_batch(batch, result):
+    """Insert new names and update existing ones with executemany, in one transaction"""
+    existing = {name for (name,) in db.session.query(Product.name).filter(Product.name.in_(list(batch)))}
+    inserts = [dict(IMPORT_DEFAULTS, **row) for name, row in batch.items() if name not in existing]
+    updates = {}
+    for name, row in batch.items():
+        if name in existing:
+            # Only overwrite the columns the file actually supplied
+            updates.setdefault(tuple(sorted(row)), []).append(dict(row, match_name=name))
+    if inserts:
+        db.session.execute(db.insert(Product), inserts)
+    for fields, rows in updates.items():
+        stmt = (Product.__table__.update()
+                .where(Product.name == bindparam('match_name'))
+                .values({f: bindparam(f) for f in fields if f != 'name'}))
+        db.session.execute(stmt, rows)
+    queue_image_fetches(row.get('image_url') for row in batch.values())
+    db.session.info['catalog_dirty'] = True
+    db.session.commit()
+    result.inserted += len(inserts)
+    result.updated += sum(len(rows) for rows in updates.values())
+
+def import_batch(batch, result):
+    """Upsert {name: (line, row)}; if the database rejects the batch, split it to find and report the bad rows"""
+    try:
+        upsert_product_batch({name: row for name, (line, row) in batch.items()}, result)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        if len(batch) == 1:
+            (line, row), = batch.values()
+            message = str(getattr(e, 'orig', e)).strip().splitlines()[0][:200]
+            result.error(line, f'rejected by the database: {message}')
+            return
+        names = list(batch)
+        for half in (names[:len(names) // 2], names[len(names) // 2:]):
+            import_batch({name: batch[name] for name in half}, result)
+
+def import_products(stream, fmt='csv'):
+    """Stream CSV or NDJSON product rows into the catalog, upserting by product name.
+
+    Rows are committed in batches of IMPORT_BATCH_SIZE, so memory use stays flat
+    and a bad row is reported without aborting the rest of the file.
+    """
+    result = ImportResult()
+    batch = {}
+    for line, record in read_import_records(stream, fmt):
+        result.rows += 1
+        if record is None:
+            result.error(line, 'invalid JSON')
+            continue
+        try:
+            row = clean_import_row(record)
+        except ValueError as e:
+            result.error(line, str(e))
+            continue
+        batch[row['name']] = (line, row)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            import_batch(batch, result)
+            batch = {}
+    if batch:
+        import_batch(batch, result)
+    return result
+
+def export_products(fmt='csv'):
+    """Yield the whole catalog as CSV or NDJSON text, one keyset batch at a time"""
+    after = None
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_FIELDS)
+        yield buffer.getvalue()
+    while True:
+        rows = product_rows(EXPORT_FIELDS, 'id', after=after, limit=API_STREAM_BATCH)
+        if fmt == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerows(row[:len(EXPORT_FIELDS)] for row in rows)
+            yield buffer.getvalue()
+        else:
+            yield ''.join(json.dumps(dict(zip(EXPORT_FIELDS, row))) + '\n' for row in rows)
+        if len(rows) < API_STREAM_BATCH:
+            return
+        after = row_cursor(rows[-1])
 
 # -------------------- Storefront Routes --------------------
 @app.route('/')
@@ -250,35 +2537,61 @@ def get_wishlist_products(user_id):
 def index():
     q = request.args.get('q', '').strip()
     category = request.args.get('category', '').strip()
-    query = Product.query
+    shareable = is_shareable_request()
+    if shareable:
+        state = catalog_state()
+        etag = make_etag('index', state.etag, image_index.version, q, category)
+        cached = not_modified(etag, state.last_modified)
+        if cached:
+            return cached
+    categories = catalog_categories()
     if q:
-        query = query.filter(Product.name.ilike(f'%{q}%'))
-    if category:
-        query = query.filter(Product.category == category)
-    categories = [c[0] for c in db.session.query(Product.category).distinct().all()]
-    products = query.order_by(Product.created_at.desc()).all()
-    
-    # Get user's wishlist if logged in
-    user_wishlist = []
-    if 'user_id' in session:
-        user_wishlist = [item.product_id for item in Wishlist.query.filter_by(user_id=session['user_id']).all()]
+        products = search_products(q, category)
+    elif category:
+        products = catalog_listing(category)
+    else:
+        products = catalog_products()
     
-    return render_template('index.html', products=products, q=q, category=category, categories=categories, user_wishlist=user_wishlist)
+    # Only the wishlist buttons differ per user; the cards themselves come from the fragment cache
+    user_wishlist = user_wishlist_ids(session['user_id']) if 'user_id' in session else None
+    # Only the full catalog and real categories are worth a cached join; each card is cached regardless
+    listing_key = None if q or (category and category not in categories) else ('index', category)
+    cards = product_cards(listing_key, products, user_wishlist)
+    page = render_template('index.html', products=products, q=q, category=category, categories=categories,
+                           product_cards=cards)
+    if shareable:
+        return cache_headers(page, etag, state.last_modified)
+    return private_cache_headers(page)
 
 @app.route('/product/<int:pid>')
 def product_detail(pid):
-    product = Product.query.get_or_404(pid)
-    in_wishlist = False
-    if 'user_id' in session:
-        in_wishlist = bool(Wishlist.query.filter_by(user_id=session['user_id'], product_id=pid).first())
-    return render_template('product_detail.html', product=product, in_wishlist=in_wishlist)
+    product = catalog_product(pid)
+    if product is None:
+        abort(404)
+    shareable = is_shareable_request()
+    if shareable:
+        # Recommendations are secondary: they refresh on the next full render, and leaving
+        # them out of the validator lets a revalidation be answered without touching the DB
+        etag = make_etag('product', *product, image_index.get(product.image_url))
+        last_modified = product.updated_at or product.created_at
+        cached = not_modified(etag, last_modified)
+        if cached:
+            return cached
+    recommendations = product_recommendations(pid)
+    in_wishlist = 'user_id' in session and pid in user_wishlist_ids(session['user_id'])
+    page = render_template('product_detail.html', product=product, in_wishlist=in_wishlist,
+                           recommendations=recommendations)
+    if shareable:
+        return cache_headers(page, etag, last_modified)
+    return private_cache_headers(page)
 
 # -------------------- Cart (Authentication Required) --------------------
 @app.route('/cart')
 @login_required
 def cart_view():
     items, total = cart_items_details()
-    return render_template('cart.html', items=items, total=total)
+    recommendations = recommended_products(cart_recommended_ids([item['product'].id for item in items]))
+    return render_template('cart.html', items=items, total=total, recommendations=recommendations)
 
 @app.route('/cart/add/<int:pid>', methods=['POST'])
 @login_required
@@ -319,6 +2632,91 @@ def update_cart(pid):
     save_cart(cart)
     return redirect(url_for('cart_view'))
 
+CART_OPS = ('add', 'set', 'remove')
+CART_BATCH_LIMIT = 100
+
+def clean_cart_op(raw):
+    """Validate one /api/cart operation into (op, product_id, quantity); raises ValueError"""
+    if not isinstance(raw, dict):
+        raise ValueError('operation must be an object')
+    op = raw.get('op')
+    if op not in CART_OPS:
+        raise ValueError(f"op must be one of: {', '.join(CART_OPS)}")
+    pid = raw.get('product_id')
+    if not isinstance(pid, int) or isinstance(pid, bool):
+        raise ValueError('product_id must be an integer')
+    if op == 'remove':
+        return op, pid, 0
+    qty = raw.get('quantity', 1)
+    if not isinstance(qty, int) or isinstance(qty, bool):
+        raise ValueError('quantity must be an integer')
+    # set to 0 removes the line, like the cart page's quantity box
+    if qty < (1 if op == 'add' else 0):
+        raise ValueError('quantity must be positive' if op == 'add' else 'quantity cannot be negative')
+    return op, pid, qty
+
+def apply_cart_ops(cart, ops):
+    """Apply validated operations in order to a copy of the cart.
+
+    Products being added must exist; they are checked with one IN (...)
+    query before anything changes, so a bad batch leaves the cart alone.
+    """
+    wanted = {pid for op, pid, qty in ops if qty > 0}
+    known = {pid for (pid,) in db.session.query(Product.id).filter(Product.id.in_(wanted))} if wanted else set()
+    missing = sorted(wanted - known)
+    if missing:
+        raise APIError(f"Unknown product ids: {', '.join(map(str, missing))}.")
+    cart = dict(cart)
+    for op, pid, qty in ops:
+        key = str(pid)
+        if op == 'add':
+            cart[key] = cart.get(key, 0) + qty
+        elif op == 'set' and qty > 0:
+            cart[key] = qty
+        else:
+            cart.pop(key, None)
+    return cart
+
+def cart_payload(cart):
+    items, total = price_cart(cart)
+    return {
+        'lines': [{
+            'product_id': it['product'].id,
+            'name': it['product'].name,
+            'price': it['product'].price,
+            'quantity': it['qty'],
+            'subtotal': round(it['subtotal'], 2),
+        } for it in items],
+        'total': round(total, 2),
+        'cart_count': len(cart),
+    }
+
+@app.route('/api/cart', methods=['GET', 'POST'])
+@login_required
+def api_cart():
+    """Batch cart edit: {"ops": [{"op": "add"|"set"|"remove", "product_id": 1, "quantity": 2}, ...]}.
+
+    The whole batch is applied with a single cart write and answered with
+    the repriced cart, so the page never has to reload /cart.
+    """
+    cart = get_cart()
+    if request.method == 'POST':
+        body = request.get_json(silent=True)
+        raw_ops = body.get('ops') if isinstance(body, dict) else None
+        if not isinstance(raw_ops, list):
+            raise APIError('Body must be {"ops": [...]}.')
+        if len(raw_ops) > CART_BATCH_LIMIT:
+            raise APIError(f'At most {CART_BATCH_LIMIT} operations per request.')
+        ops = []
+        for index, raw in enumerate(raw_ops):
+            try:
+                ops.append(clean_cart_op(raw))
+            except ValueError as e:
+                raise APIError(f'ops[{index}]: {e}.')
+        cart = apply_cart_ops(cart, ops)
+        save_cart(cart)
+    return private_cache_headers(jsonify(cart_payload(cart)))
+
 @app.route('/checkout', methods=['GET', 'POST'])
 @login_required
 def checkout():
@@ -349,29 +2747,16 @@ def checkout():
             flash('Please fill all required fields.', 'warning')
             return redirect(url_for('checkout'))
         
-        final_total = total + donation_amount
-        
-        order = Order(
-            customer_name=name, 
-            customer_email=email, 
-            address=address, 
-            total_amount=final_total,
-            donation_amount=donation_amount,
-            charity_name=charity_name
-        )
-        db.session.add(order)
-        db.session.commit()
-        
-        for it in items:
-            db.session.add(OrderItem(
-                order_id=order.id, 
-                product_id=it['product'].id, 
-                quantity=it['qty'], 
-                unit_price=it['product'].price
-            ))
-        db.session.commit()
+        try:
+            order = place_order(items, name, email, address, donation_amount, charity_name)
+        except OutOfStockError as e:
+            flash(str(e), 'warning')
+            return redirect(url_for('cart_view'))
+        except OrderError as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('checkout'))
         
-        session['cart'] = {}  # clear cart
+        save_cart({})  # clear cart
         
         success_message = f'Thank you! Order #{order.id} placed successfully.'
         if donation_amount > 0:
@@ -390,7 +2775,7 @@ def share_cart():
         flash("Your cart is empty.", "warning")
         return redirect(url_for('cart_view'))
     token = str(uuid.uuid4())
-    shared_carts[token] = cart
+    shared_cart_store.save(token, cart)
     share_url = url_for('load_shared_cart', token=token, _external=True)
     flash(f"Share your cart with this link: {share_url}", "info")
     return redirect(url_for('cart_view'))
@@ -398,11 +2783,11 @@ def share_cart():
 @app.route('/cart/share/<token>')
 @login_required
 def load_shared_cart(token):
-    cart = shared_carts.get(token)
-    if not cart:
+    shared = shared_cart_store.load(token)
+    if not shared:
         flash("Shared cart not found or expired.", "danger")
         return redirect(url_for('cart_view'))
-    save_cart(cart)
+    save_cart(dict(shared[0]))
     flash("Shared cart loaded.", "success")
     return redirect(url_for('cart_view'))
 
@@ -475,6 +2860,7 @@ def share_wishlist():
     )
     db.session.add(shared_wishlist)
     db.session.commit()
+    shared_wishlist_sweeper.maybe_run()
     
     share_url = url_for('view_shared_wishlist', token=token, _external=True)
     flash(f"Share your wishlist with this link: {share_url}", "info")
@@ -482,22 +2868,22 @@ def share_wishlist():
 
 @app.route('/wishlist/shared/<token>')
 def view_shared_wishlist(token):
-    shared_wishlist = SharedWishlist.query.filter_by(token=token).first()
+    shared_wishlist = load_shared_wishlist(token)
     if not shared_wishlist:
         flash("Shared wishlist not found or expired.", "danger")
         return redirect(url_for('index'))
     
-    wishlist_data = json.loads(shared_wishlist.wishlist_data)
-    products = []
-    
-    for product_info in wishlist_data['products']:
-        product = Product.query.get(product_info['id'])
-        if product:
-            products.append(product)
-    
+    # The page only varies by logged-in state, so hot tokens skip rendering too.
+    # The key holds the resolved view, so a changed product or a newly fetched image renders afresh.
+    if '_flashes' in session:
+        return render_shared_wishlist(shared_wishlist)
+    cache_key = ('shared_wishlist_page', shared_wishlist, 'user_id' in session, image_index.version)
+    return fragment_cache.get(cache_key, lambda: render_shared_wishlist(shared_wishlist))
+
+def render_shared_wishlist(shared_wishlist):
     return render_template('shared_wishlist.html', 
-                         products=products, 
-                         owner_name=wishlist_data['user_name'],
+                         products=shared_wishlist.products, 
+                         owner_name=shared_wishlist.owner_name,
                          shared_date=shared_wishlist.created_at)
 
 @app.route('/wishlist/add_to_cart/<int:pid>', methods=['POST'])
@@ -528,15 +2914,67 @@ def add_wishlist_to_cart(pid):
 def clear_wishlist():
     """Clear entire wishlist for current user"""
     user_id = session['user_id']
-    wishlist_items = Wishlist.query.filter_by(user_id=user_id).all()
-    
-    for item in wishlist_items:
-        db.session.delete(item)
-    
+    Wishlist.query.filter_by(user_id=user_id).delete(synchronize_session=False)
     db.session.commit()
     flash("Wishlist cleared successfully.", "success")
     return redirect(url_for('wishlist'))
 
+@app.route('/wishlist/bulk/add', methods=['POST'])
+@login_required
+def bulk_add_to_wishlist():
+    """Add many products to the wishlist in one transaction"""
+    user_id = session['user_id']
+    ids = requested_product_ids()
+    existing = {pid for (pid,) in db.session.query(Wishlist.product_id)
+                .filter(Wishlist.user_id == user_id, Wishlist.product_id.in_(ids))}
+    valid = [pid for (pid,) in db.session.query(Product.id).filter(Product.id.in_(ids))]
+    new_ids = [pid for pid in valid if pid not in existing]
+    if new_ids:
+        db.session.execute(db.insert(Wishlist), [{'user_id': user_id, 'product_id': pid} for pid in new_ids])
+        db.session.commit()
+    if wants_json():
+        return jsonify({'success': True, 'added': new_ids})
+    flash(f'Added {len(new_ids)} item(s) to your wishlist.', 'success')
+    return redirect(request.referrer or url_for('wishlist'))
+
+@app.route('/wishlist/bulk/remove', methods=['POST'])
+@login_required
+def bulk_remove_from_wishlist():
+    """Remove many products from the wishlist with one DELETE"""
+    ids = requested_product_ids()
+    removed = Wishlist.query.filter(
+        Wishlist.user_id == session['user_id'], Wishlist.product_id.in_(ids)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    if wants_json():
+        return jsonify({'success': True, 'removed': removed})
+    flash(f'Removed {removed} item(s) from your wishlist.', 'info')
+    return redirect(request.referrer or url_for('wishlist'))
+
+@app.route('/wishlist/move_to_cart', methods=['POST'])
+@login_required
+def move_wishlist_to_cart():
+    """Move the given wishlist products (or all of them) into the cart"""
+    user_id = session['user_id']
+    ids = requested_product_ids()
+    query = db.session.query(Wishlist.product_id).filter(Wishlist.user_id == user_id)
+    if ids:
+        query = query.filter(Wishlist.product_id.in_(ids))
+    moved = [pid for (pid,) in query]
+    if moved:
+        cart = get_cart()
+        for pid in moved:
+            cart[str(pid)] = cart.get(str(pid), 0) + 1
+        Wishlist.query.filter(
+            Wishlist.user_id == user_id, Wishlist.product_id.in_(moved)
+        ).delete(synchronize_session=False)
+        # The cart write commits the wishlist delete in the same transaction
+        save_cart(cart)
+    if wants_json():
+        return jsonify({'success': True, 'moved': moved, 'cart_count': len(get_cart())})
+    flash(f'Moved {len(moved)} item(s) to your cart.', 'success')
+    return redirect(url_for('wishlist'))
+
 # -------------------- User Auth --------------------
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -552,10 +2990,25 @@ def login():
             flash("Password is required.", "danger")
             return redirect(url_for('login'))
 
+        if auth_rate_limited(email):
+            flash("Too many login attempts. Please wait a minute and try again.", "danger")
+            return render_template('login.html'), 429
+
         user = User.query.filter_by(email=email).first()
 
         if user:
-            if user.check_password(password):
+            try:
+                password_ok = user.check_password(password)
+            except HasherBusy:
+                flash("We're handling a lot of logins right now. Please try again shortly.", "warning")
+                return render_template('login.html'), 503
+            if password_ok:
+                if user.password_needs_rehash():
+                    try:
+                        user.set_password(password)
+                        db.session.commit()
+                    except HasherBusy:
+                        pass  # Try again on a later login
                 session['user_id'] = user.id
                 session['user'] = user.name
                 flash(f"Welcome back, {user.name}!", "success")
@@ -595,6 +3048,10 @@ def signup():
             flash("Password must contain at least one uppercase letter, one lowercase letter, one number, and one special character, and be at least 8 characters long.", "danger")
             return redirect(url_for('signup'))
 
+        if auth_rate_limited():
+            flash("Too many attempts. Please wait a minute and try again.", "danger")
+            return render_template('signup.html', email=email), 429
+
         if User.query.filter_by(email=email).first():
             flash("An account with this email already exists. Please login instead.", "warning")
             return redirect(url_for('login'))
@@ -612,6 +3069,9 @@ def signup():
             db.session.commit()
             flash("Account created successfully! Please login with your credentials.", "success")
             return redirect(url_for('login'))
+        except HasherBusy:
+            flash("We're handling a lot of sign-ups right now. Please try again shortly.", "warning")
+            return render_template('signup.html', email=email), 503
         except Exception as e:
             flash("An error occurred while creating your account. Please try again.", "danger")
             return redirect(url_for('signup'))
@@ -633,23 +3093,689 @@ def logout():
 
 
 
+# -------------------- Admin --------------------
+@app.route('/admin/login', methods=['GET', 'POST'])
+def admin_login():
+    if request.method == 'POST':
+        username = request.form.get('username', '').strip()
+        password = request.form.get('password', '')
+
+        if auth_rate_limited(username):
+            flash("Too many login attempts. Please wait a minute and try again.", "danger")
+            return render_template('admin_login.html'), 429
+
+        user = User.query.filter_by(username=username).first()
+        try:
+            valid = username == app.config['ADMIN_USERNAME'] and user and user.check_password(password)
+        except HasherBusy:
+            flash("We're handling a lot of logins right now. Please try again shortly.", "warning")
+            return render_template('admin_login.html'), 503
+        if not valid:
+            flash("Invalid admin credentials.", "danger")
+            return redirect(url_for('admin_login'))
+        session['is_admin'] = True
+        flash("Welcome, admin!", "success")
+        return redirect(url_for('admin_dashboard'))
+
+    return render_template('admin_login.html')
+
+@app.route('/admin/logout')
+def admin_logout():
+    session.pop('is_admin', None)
+    flash("Logged out of admin.", "info")
+    return redirect(url_for('index'))
+
+ADMIN_PAGE_SIZE = 50
+ADMIN_MAX_PAGE_SIZE = 200
+ADMIN_PATCH_LIMIT = 1000
+LOW_STOCK_THRESHOLD = 10
+# Stock is nullable, so sort and filter on a coalesced value to keep keyset comparisons total
+ADMIN_STOCK = db.func.coalesce(Product.stock, 0)
+ADMIN_SORTS = {
+    'id': Product.id,
+    'name': Product.name,
+    'price': Product.price,
+    'stock': ADMIN_STOCK,
+}
+# JSON types a cursor's sort value may have for each sort
+ADMIN_CURSOR_TYPES = {
+    'id': (int,),
+    'name': (str,),
+    'price': (int, float),
+    'stock': (int,),
+}
+ADMIN_STOCK_FILTERS = {
+    'out': ADMIN_STOCK <= 0,
+    'low': and_(ADMIN_STOCK > 0, ADMIN_STOCK <= LOW_STOCK_THRESHOLD),
+    'in': ADMIN_STOCK > 0,
+}
+ADMIN_ROW_FIELDS = ('id', 'name', 'description', 'price', 'image_url', 'category', 'stock')
+
+def admin_filters(args):
+    """Validated listing filters from the query string"""
+    filters = {
+        'q': args.get('q', '').strip(),
+        'category': args.get('category', '').strip(),
+        'stock': args.get('stock', ''),
+        'sort': args.get('sort', 'id'),
+        'dir': args.get('dir', 'asc'),
+    }
+    if filters['sort'] not in ADMIN_SORTS:
+        raise APIError(f"sort must be one of {', '.join(ADMIN_SORTS)}.")
+    if filters['dir'] not in ('asc', 'desc'):
+        raise APIError('dir must be asc or desc.')
+    if filters['stock'] and filters['stock'] not in ADMIN_STOCK_FILTERS:
+        raise APIError(f"stock must be one of {', '.join(ADMIN_STOCK_FILTERS)}.")
+    return filters
+
+def admin_product_page(filters, after=None, limit=ADMIN_PAGE_SIZE):
+    """One keyset page of admin rows plus the cursor for the next page.
+
+    The cursor is [sort value, id]; id breaks ties so pages never overlap
+    or skip rows, whatever column the table is sorted on.
+    """
+    key = ADMIN_SORTS[filters['sort']]
+    descending = filters['dir'] == 'desc'
+    stmt = db.select(*(getattr(Product, f) for f in ADMIN_ROW_FIELDS), key.label('sort_key'))
+    if filters['q']:
+        escaped = filters['q'].replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        stmt = stmt.where(Product.name.ilike(f'%{escaped}%', escape='\\'))
+    if filters['category']:
+        stmt = stmt.where(Product.category == filters['category'])
+    if filters['stock']:
+        stmt = stmt.where(ADMIN_STOCK_FILTERS[filters['stock']])
+    if after:
+        value, pid = after
+        if key is Product.id:
+            stmt = stmt.where(Product.id < pid if descending else Product.id > pid)
+        elif descending:
+            stmt = stmt.where(or_(key < value, and_(key == value, Product.id < pid)))
+        else:
+            stmt = stmt.where(or_(key > value, and_(key == value, Product.id > pid)))
+    if descending:
+        stmt = stmt.order_by(key.desc(), Product.id.desc())
+    else:
+        stmt = stmt.order_by(key, Product.id)
+    # Fetch one extra row to know whether another page exists
+    rows = db.session.execute(stmt.limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor([last.sort_key, last.id])
+    return rows[:limit], next_cursor
+
+def admin_page_args(filters, cursor):
+    """Query args for the next-page link, dropping empty filters"""
+    args = {k: v for k, v in filters.items() if v and (k, v) not in (('sort', 'id'), ('dir', 'asc'))}
+    args['cursor'] = cursor
+    return args
+
+def clean_product_patch(raw):
+    """Validate one PATCH entry into (id, {field: value}); raises ValueError"""
+    if not isinstance(raw, dict):
+        raise ValueError('update must be an object')
+    pid = raw.get('id')
+    if not isinstance(pid, int) or isinstance(pid, bool):
+        raise ValueError('id must be an integer')
+    unknown = set(raw) - {'id', 'name', 'description', 'price', 'image_url', 'category', 'stock'}
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+    fields = {}
+    if 'name' in raw:
+        name = str(raw['name'] or '').strip()
+        if not name:
+            raise ValueError('name cannot be empty')
+        fields['name'] = name[:120]
+    if 'description' in raw:
+        fields['description'] = str(raw['description'] or '').strip()
+    if 'image_url' in raw:
+        image_url = str(raw['image_url'] or '').strip()
+        if len(image_url) > 255:
+            raise ValueError('image_url is longer than 255 characters')
+        fields['image_url'] = image_url or IMPORT_DEFAULTS['image_url']
+    if 'price' in raw:
+        try:
+            price = float(raw['price'])
+        except (TypeError, ValueError):
+            raise ValueError('price must be a number')
+        if price < 0 or price != price:
+            raise ValueError('price must be a non-negative number')
+        fields['price'] = price
+    if 'category' in raw:
+        fields['category'] = str(raw['category'] or '').strip()[:80] or IMPORT_DEFAULTS['category']
+    if 'stock' in raw:
+        try:
+            stock = int(raw['stock'])
+        except (TypeError, ValueError):
+            raise ValueError('stock must be an integer')
+        if stock < 0:
+            raise ValueError('stock cannot be negative')
+        fields['stock'] = stock
+    if not fields:
+        raise ValueError('nothing to update')
+    return pid, fields
+
+def apply_product_patches(updates):
+    """Apply many partial product updates in one transaction.
+
+    Entries are validated up front; valid ones are grouped by the set of
+    fields they change and each group is sent as a single executemany
+    UPDATE. Returns (updated ids, per-entry errors).
+    """
+    errors, cleaned = [], {}
+    for index, raw in enumerate(updates):
+        try:
+            pid, fields = clean_product_patch(raw)
+        except ValueError as e:
+            errors.append({'index': index, 'error': str(e)})
+            continue
+        # A later entry for the same product wins, like applying them in order
+        cleaned.setdefault(pid, {}).update(fields)
+
+    if cleaned:
+        existing = set(db.session.scalars(
+            db.select(Product.id).where(Product.id.in_(bindparam('ids', expanding=True))),
+            {'ids': list(cleaned)},
+        ))
+        for pid in [pid for pid in cleaned if pid not in existing]:
+            errors.append({'id': pid, 'error': 'product not found'})
+            del cleaned[pid]
+
+    groups = {}
+    for pid, fields in cleaned.items():
+        groups.setdefault(tuple(sorted(fields)), []).append(dict(fields, pid=pid))
+    now = datetime.utcnow()
+    for names, params in groups.items():
+        stmt = (Product.__table__.update()
+                .where(Product.__table__.c.id == bindparam('pid'))
+                .values(dict({n: bindparam(n) for n in names}, updated_at=now)))
+        db.session.execute(stmt, params)
+    if cleaned:
+        # Core statements bypass the ORM flush hooks, so flag the catalog by hand
+        db.session.info['catalog_dirty'] = True
+        queue_image_fetches(fields['image_url'] for fields in cleaned.values() if 'image_url' in fields)
+    db.session.commit()
+    return sorted(cleaned), errors
+
+@app.route('/admin')
+@admin_required
+def admin_dashboard():
+    filters = admin_filters(request.args)
+    after = decode_cursor(request.args['cursor'], cursor_value(*ADMIN_CURSOR_TYPES[filters['sort']])) if request.args.get('cursor') else None
+    products, next_cursor = admin_product_page(filters, after)
+    next_url = url_for('admin_dashboard', **admin_page_args(filters, next_cursor)) if next_cursor else None
+    sales_rollup_sweeper.maybe_run()
+    return render_template('admin_dashboard.html', products=products, filters=filters,
+                           categories=catalog_categories(), sorts=ADMIN_SORTS,
+                           next_cursor=next_cursor, next_url=next_url,
+                           sales=sales_summary(30), best_sellers=top_products(limit=5),
+                           donations=charity_totals(limit=5), sales_pending=sales_pending())
+
+@app.route('/admin/api/products')
+@admin_required
+def admin_api_products():
+    """Lazy-load admin rows: same filters as the dashboard plus cursor and limit.
+
+    With render=1 the response also carries the rows as table HTML so the
+    dashboard can append them without templating on the client.
+    """
+    filters = admin_filters(request.args)
+    after = decode_cursor(request.args['cursor'], cursor_value(*ADMIN_CURSOR_TYPES[filters['sort']])) if request.args.get('cursor') else None
+    try:
+        limit = min(max(int(request.args.get('limit', ADMIN_PAGE_SIZE)), 1), ADMIN_MAX_PAGE_SIZE)
+    except ValueError:
+        raise APIError('limit must be an integer.')
+    products, next_cursor = admin_product_page(filters, after, limit)
+    payload = {
+        'items': [{f: getattr(p, f) for f in ADMIN_ROW_FIELDS} for p in products],
+        'next_cursor': next_cursor,
+    }
+    if request.args.get('render') == '1':
+        payload['html'] = render_template('admin_product_rows.html', products=products)
+    return private_cache_headers(jsonify(payload))
+
+@app.route('/admin/api/products', methods=['PATCH'])
+@admin_required
+def admin_api_patch_products():
+    """Batch edit: {"updates": [{"id": 1, "price": 9.5, "stock": 20}, ...]}"""
+    body = request.get_json(silent=True)
+    updates = body.get('updates') if isinstance(body, dict) else None
+    if not isinstance(updates, list):
+        raise APIError('Body must be {"updates": [...]}.')
+    if len(updates) > ADMIN_PATCH_LIMIT:
+        raise APIError(f'At most {ADMIN_PATCH_LIMIT} updates per request.')
+    updated, errors = apply_product_patches(updates)
+    return jsonify({'updated': updated, 'errors': errors})
+
+def analytics_int_arg(name, default, maximum):
+    try:
+        return min(max(int(request.args.get(name, default)), 1), maximum)
+    except ValueError:
+        raise APIError(f'{name} must be an integer.')
+
+def analytics_response(build):
+    """Catch up if due, then read the rollups and report how far behind checkout they are"""
+    sales_rollup_sweeper.maybe_run()
+    payload = build()
+    payload['as_of_order_id'] = sales_watermark()
+    payload['pending_orders'] = sales_pending()
+    return private_cache_headers(jsonify(payload))
+
+@app.route('/admin/api/analytics/sales')
+@admin_required
+def admin_api_sales():
+    days = analytics_int_arg('days', 30, ANALYTICS_MAX_DAYS)
+    return analytics_response(lambda: sales_summary(days))
+
+@app.route('/admin/api/analytics/products')
+@admin_required
+def admin_api_top_products():
+    by = request.args.get('by', 'quantity')
+    if by not in ('quantity', 'revenue'):
+        raise APIError('by must be quantity or revenue.')
+    limit = analytics_int_arg('limit', 10, ANALYTICS_TOP_LIMIT)
+    return analytics_response(lambda: {'by': by, 'items': top_products(by, limit)})
+
+@app.route('/admin/api/analytics/charities')
+@admin_required
+def admin_api_charities():
+    limit = analytics_int_arg('limit', ANALYTICS_TOP_LIMIT, ANALYTICS_TOP_LIMIT)
+    return analytics_response(lambda: {'items': charity_totals(limit)})
+
+@app.route('/admin/products/new', methods=['POST'])
+@admin_required
+def admin_product_new():
+    try:
+        fields = clean_import_row(request.form.to_dict())
+    except ValueError as e:
+        flash(f"Could not create product: {e}.", "danger")
+        return redirect(url_for('admin_dashboard'))
+    product = Product(**dict(IMPORT_DEFAULTS, **fields))
+    db.session.add(product)
+    queue_image_fetches([product.image_url])
+    db.session.commit()
+    flash(f"Created {product.name}.", "success")
+    return redirect(url_for('admin_dashboard'))
+
+@app.route('/admin/products/<int:pid>/update', methods=['POST'])
+@admin_required
+def admin_product_update(pid):
+    product = Product.query.get_or_404(pid)
+    try:
+        fields = clean_import_row(request.form.to_dict())
+    except ValueError as e:
+        flash(f"Could not update product: {e}.", "danger")
+        return redirect(url_for('admin_dashboard'))
+    for field, value in fields.items():
+        setattr(product, field, value)
+    queue_image_fetches([product.image_url])
+    db.session.commit()
+    flash(f"Updated {product.name}.", "success")
+    return redirect(url_for('admin_dashboard'))
+
+@app.route('/admin/products/<int:pid>/delete', methods=['POST'])
+@admin_required
+def admin_product_delete(pid):
+    product = Product.query.get_or_404(pid)
+    Wishlist.query.filter_by(product_id=pid).delete(synchronize_session=False)
+    db.session.delete(product)
+    db.session.commit()
+    flash(f"Deleted {product.name}.", "info")
+    return redirect(url_for('admin_dashboard'))
+
+def import_format(filename, content_type):
+    """Pick csv or ndjson from an explicit format field, the file name or the content type"""
+    fmt = request.values.get('format', '').lower()
+    if fmt in ('csv', 'ndjson'):
+        return fmt
+    name = (filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')) or 'ndjson' in (content_type or ''):
+        return 'ndjson'
+    return 'csv'
+
+@app.route('/admin/products/import', methods=['POST'])
+@admin_required
+def admin_product_import():
+    """Bulk upsert products from an uploaded CSV/NDJSON file or a raw request body"""
+    upload = request.files.get('file')
+    if upload:
+        fmt = import_format(upload.filename, upload.content_type)
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8', newline='')
+    else:
+        fmt = import_format(None, request.content_type)
+        stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    result = import_products(stream, fmt)
+    if wants_json() or not upload:
+        return jsonify(result.to_dict())
+    flash(f"Imported {result.rows} rows: {result.inserted} new, {result.updated} updated, "
+          f"{result.error_count} errors.", "success" if not result.error_count else "warning")
+    for err in result.errors[:10]:
+        flash(f"Row {err['row']}: {err['error']}", "danger")
+    return redirect(url_for('admin_dashboard'))
+
+@app.route('/admin/products/export')
+@admin_required
+def admin_product_export():
+    fmt = 'ndjson' if request.args.get('format') == 'ndjson' else 'csv'
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'text/csv'
+    response = Response(stream_with_context(export_products(fmt)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=products.{fmt}'
+    return response
+
 # -------------------- API --------------------
+API_PRODUCT_FIELDS = ('id', 'name', 'description', 'price', 'image_url', 'category', 'stock', 'created_at')
+API_DEFAULT_FIELDS = ('id', 'name', 'price', 'image_url', 'category', 'stock')
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+API_STREAM_BATCH = 1000
+
+class APIError(Exception):
+    """Bad request parameters for a JSON API endpoint"""
+
+@app.errorhandler(APIError)
+def handle_api_error(e):
+    return jsonify({'error': str(e)}), 400
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor, key):
+    """Decode a [sort value, id] cursor.
+
+    key checks and converts the sort value, raising ValueError or TypeError
+    for one the query could not use; either way the client gets a 400.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise APIError('Invalid cursor.')
+    if not (isinstance(values, list) and len(values) == 2
+            and isinstance(values[1], int) and not isinstance(values[1], bool)):
+        raise APIError('Invalid cursor.')
+    try:
+        values[0] = key(values[0])
+    except (ValueError, TypeError):
+        raise APIError('Invalid cursor.')
+    return values
+
+def cursor_value(*types):
+    """Cursor key that accepts only JSON values of the given Python types"""
+    def check(value):
+        if isinstance(value, bool) or not isinstance(value, types):
+            raise TypeError(f'unexpected cursor value {value!r}')
+        return value
+    return check
+
+def cursor_timestamp(value):
+    """Cursor key for created_at: a naive ISO timestamp, or null for undated products"""
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise TypeError(f'unexpected cursor value {value!r}')
+    created_at = datetime.fromisoformat(value)
+    if created_at.tzinfo is not None:
+        raise ValueError('cursor timestamps are naive UTC')
+    return created_at
+
+def parse_float_arg(name):
+    value = request.args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise APIError(f'{name} must be a number.')
+
+def product_rows(fields, sort, category=None, min_price=None, max_price=None, after=None, limit=API_PAGE_SIZE):
+    """Fetch one keyset page of product column tuples (no ORM instances).
+
+    The last two columns of every row are always id and created_at so the
+    caller can build the next cursor.
+    """
+    columns = [getattr(Product, f) for f in fields] + [Product.id, Product.created_at]
+    stmt = db.select(*columns)
+    if category:
+        stmt = stmt.where(Product.category == category)
+    if min_price is not None:
+        stmt = stmt.where(Product.price >= min_price)
+    if max_price is not None:
+        stmt = stmt.where(Product.price <= max_price)
+    if sort == 'created_at':
+        # Newest first with undated products last; id breaks ties between products created in the same instant
+        if after:
+            created_at, pid = after
+            if created_at is None:
+                stmt = stmt.where(Product.created_at.is_(None), Product.id < pid)
+            else:
+                stmt = stmt.where(or_(Product.created_at < created_at,
+                                      and_(Product.created_at == created_at, Product.id < pid),
+                                      Product.created_at.is_(None)))
+        stmt = stmt.order_by(Product.created_at.desc().nulls_last(), Product.id.desc())
+    else:
+        if after:
+            stmt = stmt.where(Product.id > after[1])
+        stmt = stmt.order_by(Product.id)
+    return db.session.execute(stmt.limit(limit)).all()
+
+def row_cursor(row):
+    created_at = row[-1]
+    return [created_at.isoformat() if created_at else None, row[-2]]
+
+def serialize_row(fields, row):
+    item = dict(zip(fields, row))
+    if item.get('created_at') is not None:
+        item['created_at'] = item['created_at'].isoformat()
+    return item
+
 @app.route('/api/products')
 def api_products():
-    products = Product.query.all()
-    return jsonify([{
-        'id': p.id,
-        'name': p.name,
-        'price': p.price,
-        'image_url': p.image_url,
-        'category': p.category,
-        'stock': p.stock,
-    } for p in products])
+    """Keyset-paginated product listing.
+
+    Query params: cursor, limit, sort (id | created_at), category, min_price,
+    max_price, fields (comma separated) and format=ndjson to stream the whole
+    filtered catalog.
+    """
+    fields = API_DEFAULT_FIELDS
+    if request.args.get('fields'):
+        fields = tuple(f.strip() for f in request.args['fields'].split(',') if f.strip())
+        unknown = [f for f in fields if f not in API_PRODUCT_FIELDS]
+        if unknown or not fields:
+            raise APIError(f"Unknown fields: {', '.join(unknown)}" if unknown else 'No fields requested.')
+    state = catalog_state()
+    etag_parts = ['api', state.etag, request.query_string.decode()]
+    last_modified = state.last_modified
+    if 'stock' in fields:
+        # Orders change stock without bumping updated_at, so they need their own validator
+        stock = stock_state()
+        etag_parts.append(stock.etag)
+        last_modified = max(filter(None, (last_modified, stock.last_modified)), default=None)
+    etag = make_etag(*etag_parts)
+    cached = not_modified(etag, last_modified)
+    if cached:
+        return cached
+    sort = request.args.get('sort', 'id')
+    if sort not in ('id', 'created_at'):
+        raise APIError('sort must be id or created_at.')
+    filters = {
+        'category': request.args.get('category', '').strip() or None,
+        'min_price': parse_float_arg('min_price'),
+        'max_price': parse_float_arg('max_price'),
+    }
+    after = decode_cursor(request.args['cursor'], cursor_timestamp) if request.args.get('cursor') else None
+
+    if request.args.get('format') == 'ndjson':
+        def generate(after):
+            while True:
+                rows = product_rows(fields, sort, after=after, limit=API_STREAM_BATCH, **filters)
+                for row in rows:
+                    yield json.dumps(serialize_row(fields, row)) + '\n'
+                if len(rows) < API_STREAM_BATCH:
+                    return
+                after = row_cursor(rows[-1])
+        stream = Response(stream_with_context(generate(after)), mimetype='application/x-ndjson')
+        return cache_headers(stream, etag, last_modified)
+
+    try:
+        limit = min(max(int(request.args.get('limit', API_PAGE_SIZE)), 1), API_MAX_PAGE_SIZE)
+    except ValueError:
+        raise APIError('limit must be an integer.')
+    # Fetch one extra row to know whether another page exists
+    rows = product_rows(fields, sort, after=after, limit=limit + 1, **filters)
+    next_cursor = encode_cursor(row_cursor(rows[limit - 1])) if len(rows) > limit else None
+    return cache_headers(jsonify({
+        'items': [serialize_row(fields, row) for row in rows[:limit]],
+        'next_cursor': next_cursor,
+    }), etag, last_modified)
+
+@app.route('/api/catalog/cache')
+@internal_only
+def api_catalog_cache():
+    return jsonify(dict(catalog_cache.stats(), fragments=fragment_cache.stats()))
+
+# -------------------- CLI --------------------
+def known_queries():
+    """Representative statements for the app's hot paths, used by explain-queries"""
+    now = datetime.utcnow()
+    return [
+        ('catalog listing', db.select(Product).order_by(Product.created_at.desc())),
+        ('category listing', db.select(Product).where(Product.category == 'Fruits').order_by(Product.created_at.desc())),
+        ('category list', db.select(Product.category).distinct()),
+        ('catalog state', db.select(db.func.count(Product.id), db.func.max(Product.id), db.func.max(Product.updated_at))),
+        ('products api page', db.select(Product.id, Product.name).where(Product.id > 100).order_by(Product.id).limit(50)),
+        ('products api by date', db.select(Product.id, Product.name).where(Product.category == 'Fruits')
+            .order_by(Product.created_at.desc(), Product.id.desc()).limit(50)),
+        ('cart pricing', db.select(Product).where(Product.id.in_([1, 2, 3]))),
+        ('user wishlist', db.select(Wishlist.product_id).where(Wishlist.user_id == 1)),
+        ('wishlist products', db.select(Product).join(Wishlist, Wishlist.product_id == Product.id)
+            .where(Wishlist.user_id == 1).order_by(Wishlist.created_at)),
+        ('orders by customer', db.select(Order).where(Order.customer_email == 'a@example.com')),
+        ('recent orders', db.select(Order).where(Order.created_at >= now).order_by(Order.created_at)),
+        ('order items', db.select(OrderItem).where(OrderItem.order_id == 1)),
+        ('product sales', db.select(OrderItem.order_id).where(OrderItem.product_id == 1)),
+        ('shared cart lookup', db.select(SharedCart.cart_data).where(SharedCart.token == 'x')),
+        ('shared cart purge', db.select(SharedCart.id).where(SharedCart.created_at < now)),
+        ('shared wishlist purge', db.select(SharedWishlist.id).where(SharedWishlist.expires_at < now)),
+        ('cart purge', db.select(CartSession.id).where(CartSession.updated_at < now)),
+        ('product recommendations', db.select(ProductRecommendation.other_id)
+            .where(ProductRecommendation.product_id == 1).order_by(ProductRecommendation.rank)),
+        ('cart recommendations', db.select(ProductRecommendation.other_id)
+            .where(ProductRecommendation.product_id.in_([1, 2, 3])).group_by(ProductRecommendation.other_id)),
+        ('co-purchase row', db.select(ProductPair.other_id, ProductPair.orders).where(ProductPair.product_id.in_([1, 2, 3]))),
+    ]
+
+def is_full_scan(detail):
+    """A plain table SCAN (no index at all) means an index is missing"""
+    return detail.startswith('SCAN ') and ' USING ' not in detail
+
+@app.cli.command('explain-queries')
+def explain_queries():
+    """Run EXPLAIN QUERY PLAN over the known queries and flag full scans."""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('explain-queries only supports SQLite.')
+    flagged = []
+    with db.engine.connect() as conn:
+        for name, stmt in known_queries():
+            compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={'render_postcompile': True})
+            params = tuple(compiled.params[key] for key in compiled.positiontup)
+            plan = [row[3] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params)]
+            if any(is_full_scan(detail) for detail in plan):
+                status = 'FULL SCAN'
+                flagged.append(name)
+            elif any('USE TEMP B-TREE' in detail for detail in plan):
+                # Sorting an already index-narrowed result is fine, but worth seeing
+                status = 'sort'
+            else:
+                status = 'ok'
+            click.echo(f'{name:<24} {status:<10} {" | ".join(plan)}')
+    if flagged:
+        raise click.ClickException(f"{len(flagged)} quer{'y' if len(flagged) == 1 else 'ies'} need an index: {', '.join(flagged)}")
+    click.echo('All known queries use indexes.')
+
+@app.cli.command('rollup-sales')
+@click.option('--rebuild', is_flag=True, help='Clear the rollups and recompute them from every order.')
+def rollup_sales_command(rebuild):
+    """Fold orders placed since the last run into the sales analytics tables."""
+    if rebuild:
+        for model in (DailySales, ProductSales, CharityDonation):
+            db.session.execute(db.delete(model))
+        db.session.execute(db.delete(RollupWatermark).where(RollupWatermark.name == SALES_WATERMARK))
+        db.session.commit()
+    processed = catch_up_sales_rollups()
+    click.echo(f'Rolled up {processed} orders; watermark at order {sales_watermark()}.')
+
+@app.cli.command('update-recommendations')
+@click.option('--rebuild', is_flag=True, help='Clear the co-purchase counts and recompute them from every order.')
+def update_recommendations_command(rebuild):
+    """Fold orders placed since the last run into the "frequently bought together" rankings."""
+    if rebuild:
+        for model in (ProductPair, ProductRecommendation):
+            db.session.execute(db.delete(model))
+        db.session.execute(db.delete(RollupWatermark).where(RollupWatermark.name == COPURCHASE_WATERMARK))
+        db.session.commit()
+    processed = catch_up_recommendations()
+    click.echo(f'Processed {processed} orders; watermark at order {sales_watermark(COPURCHASE_WATERMARK)}.')
+
+@app.cli.command('worker')
+@click.option('--threads', type=int, default=None, help='Jobs to run at once (default JOB_WORKER_THREADS).')
+@click.option('--once', is_flag=True, help='Run the jobs that are due now, then exit.')
+def worker_command(threads, once):
+    """Run queued background jobs (order emails, stock checks, sales rollups)."""
+    if once:
+        click.echo(f'Ran {job_worker.run_pending()} jobs.')
+        return
+    worker = JobWorker(threads or app.config['JOB_WORKER_THREADS'] or 1, app.config['JOB_POLL_INTERVAL']).start()
+    click.echo(f'Job worker running with {worker.threads} threads; Ctrl+C to stop.')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        worker.stop()
+
+@app.cli.command('fetch-images')
+@click.option('--now', is_flag=True, help='Run the queued jobs here instead of leaving them to a worker.')
+def fetch_images_command(now):
+    """Queue a local copy of every product image that has not been fetched yet."""
+    urls = db.session.scalars(db.select(Product.image_url).distinct())
+    queued = queue_image_fetches(urls)
+    db.session.commit()
+    click.echo(f'Queued {queued} new images.')
+    if now:
+        click.echo(f'Ran {job_worker.run_pending()} jobs.')
+
+@app.cli.command('import-products')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+def import_products_command(path, fmt):
+    """Bulk upsert products from a CSV or NDJSON file."""
+    fmt = fmt or ('ndjson' if path.lower().endswith(('.ndjson', '.jsonl')) else 'csv')
+    started = time.perf_counter()
+    with open(path, encoding='utf-8', newline='') as stream:
+        result = import_products(stream, fmt)
+    elapsed = time.perf_counter() - started
+    click.echo(f'{result.rows} rows in {elapsed:.1f}s ({result.rows / max(elapsed, 1e-9):.0f} rows/s): '
+               f'{result.inserted} inserted, {result.updated} updated, {result.error_count} errors')
+    for err in result.errors:
+        click.echo(f"  row {err['row']}: {err['error']}", err=True)
+
+@app.cli.command('export-products')
+@click.argument('path', required=False)
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default='csv')
+def export_products_command(path, fmt):
+    """Stream the catalog to PATH (or stdout) as CSV or NDJSON."""
+    out = open(path, 'w', encoding='utf-8', newline='') if path else sys.stdout
+    try:
+        for chunk in export_products(fmt):
+            out.write(chunk)
+    finally:
+        if path:
+            out.close()
 
 # -------------------- Run App --------------------
 if __name__ == '__main__':
     app.secret_key = app.config['SECRET_KEY']
-    with app.app_context():
-        db.create_all()
-        init_db()
+    init_db()
+    # Run background jobs in-process for local development; deployments run `flask worker`
+    # debug=True runs under the reloader; only its child process serves requests
+    if app.config['JOB_WORKER_THREADS'] and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        job_worker.start()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,90 @@
+"""Concurrent checkout benchmark.
+
+Runs many parallel place_order() calls against a throwaway SQLite database
+for a product with limited stock and reports throughput and oversell, then
+checks the sales rollups counted every placed order exactly once.
+
+    python benchmarks/checkout_concurrency.py --workers 16 --orders 400 --stock 250
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--orders', type=int, default=400)
+    parser.add_argument('--stock', type=int, default=250)
+    parser.add_argument('--lines', type=int, default=5, help='cart lines per order')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='grocery-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    sys.path.insert(0, ROOT)
+    from app import app, db, Product, DailySales, place_order, OutOfStockError, OrderError, catch_up_sales_rollups
+
+    with app.app_context():
+        db.create_all()
+        products = [Product(name=f'Bench item {i}', price=10.0 + i, stock=args.stock) for i in range(args.lines)]
+        db.session.add_all(products)
+        db.session.commit()
+        product_ids = [p.id for p in products]
+
+    counts = {'placed': 0, 'out_of_stock': 0, 'busy': 0}
+    lock = threading.Lock()
+    per_worker = args.orders // args.workers
+
+    def worker():
+        with app.app_context():
+            for _ in range(per_worker):
+                items = [{'product': db.session.get(Product, pid), 'qty': 1, 'subtotal': 0.0} for pid in product_ids]
+                try:
+                    place_order(items, 'Bench', 'bench@example.com', 'Nowhere')
+                    outcome = 'placed'
+                except OutOfStockError:
+                    outcome = 'out_of_stock'
+                except OrderError:
+                    outcome = 'busy'
+                finally:
+                    db.session.remove()
+                with lock:
+                    counts[outcome] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(args.workers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        stock = [db.session.get(Product, pid).stock for pid in product_ids]
+        inline_rolled_up = db.session.scalar(db.select(db.func.sum(DailySales.orders))) or 0
+        # Every checkout has committed by now, so there are no stragglers to wait for
+        catch_up_sales_rollups(lag=0)
+        rolled_up = db.session.scalar(db.select(db.func.sum(DailySales.orders))) or 0
+    attempted = per_worker * args.workers
+    # Every order takes one unit of every product
+    oversold = max(0, counts['placed'] - args.stock) + sum(max(0, -s) for s in stock)
+    print(f'attempted orders : {attempted}')
+    print(f"placed           : {counts['placed']}")
+    print(f"out of stock     : {counts['out_of_stock']}")
+    print(f"busy             : {counts['busy']}")
+    print(f'throughput       : {attempted / elapsed:.1f} checkouts/s')
+    print(f'remaining stock  : {stock}')
+    print(f'oversold units   : {oversold}')
+    print(f'rolled up orders : {rolled_up} ({inline_rolled_up} at checkout)')
+    consistent = all(s == args.stock - counts['placed'] for s in stock) and rolled_up == counts['placed']
+    print('OK' if oversold == 0 and consistent else 'FAILED')
+    return 0 if oversold == 0 and consistent else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
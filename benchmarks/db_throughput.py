@@ -0,0 +1,110 @@
+"""Concurrent SQLite read/write throughput, with and without connection tuning.
+
+Each run uses a fresh throwaway database. Readers page through products while
+writers update stock and insert orders; the script reports operations per
+second and lock errors for the default settings and for the tuned pragmas.
+
+    python benchmarks/db_throughput.py --readers 8 --writers 2 --seconds 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def run_once(args):
+    """Run one measurement in this process and print the result as JSON"""
+    tmp = tempfile.mkdtemp(prefix='grocery-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    sys.path.insert(0, ROOT)
+    from sqlalchemy.exc import OperationalError
+    from app import app, db, Product, Order
+
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.insert(Product), [
+            {'name': f'Bench item {i}', 'price': 1.0 + i % 50, 'category': f'Cat {i % 20}', 'stock': 10 ** 6}
+            for i in range(args.products)
+        ])
+        db.session.commit()
+
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+
+    def reader(n):
+        with app.app_context():
+            while time.perf_counter() < deadline:
+                try:
+                    db.session.execute(
+                        db.select(Product.id, Product.name, Product.price)
+                        .where(Product.category == f'Cat {n % 20}').limit(50)
+                    ).all()
+                    outcome = 'reads'
+                except OperationalError:
+                    outcome = 'errors'
+                db.session.remove()
+                with lock:
+                    counts[outcome] += 1
+
+    def writer(n):
+        with app.app_context():
+            while time.perf_counter() < deadline:
+                try:
+                    db.session.execute(Product.__table__.update().where(Product.id == 1 + n)
+                                       .values(stock=Product.stock - 1))
+                    db.session.add(Order(customer_name='Bench', customer_email='b@example.com',
+                                         address='Nowhere', total_amount=1.0))
+                    db.session.commit()
+                    outcome = 'writes'
+                except OperationalError:
+                    db.session.rollback()
+                    outcome = 'errors'
+                db.session.remove()
+                with lock:
+                    counts[outcome] += 1
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(json.dumps({k: v / args.seconds if k != 'errors' else v for k, v in counts.items()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--single', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        run_once(args)
+        return 0
+
+    # Pragmas are applied at import time, so each mode runs in its own interpreter
+    results = {}
+    for label, tuning in (('default', '0'), ('tuned', '1')):
+        env = dict(os.environ, SQLITE_TUNING=tuning)
+        out = subprocess.run([sys.executable, __file__, '--single'] + sys.argv[1:],
+                             env=env, capture_output=True, text=True, check=True).stdout
+        results[label] = json.loads(out.strip().splitlines()[-1])
+
+    print(f"{'mode':<10}{'reads/s':>12}{'writes/s':>12}{'lock errors':>14}")
+    for label, r in results.items():
+        print(f"{label:<10}{r['reads']:>12.1f}{r['writes']:>12.1f}{r['errors']:>14}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""Cold-start benchmark: time to import the app and serve its first request.
+
+Each sample runs in a fresh interpreter against a database that was
+bootstrapped once up front (as `flask init-db` would in a deploy hook), so the
+numbers reflect what a new gunicorn worker pays.
+
+    python benchmarks/startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+SAMPLE = r'''
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, ROOT)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+statements = []
+event.listen(Engine, 'before_cursor_execute', lambda *args: statements.append(1))
+import app as grocery
+imported = time.perf_counter()
+import_statements = len(statements)
+response = grocery.app.test_client().get('/')
+assert response.status_code == 200, response.status_code
+first = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_request_ms': (first - start) * 1000,
+    'import_queries': import_statements,
+}))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='grocery-bench-')
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'],
+                   cwd=ROOT, env=env, check=True, capture_output=True)
+
+    samples = []
+    for _ in range(args.runs):
+        out = subprocess.run([sys.executable, '-c', f'ROOT = {ROOT!r}\n' + SAMPLE],
+                             env=env, check=True, capture_output=True, text=True).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+
+    for key in ('import_ms', 'first_request_ms'):
+        values = [s[key] for s in samples]
+        print(f'{key:<18} median {statistics.median(values):8.1f}   min {min(values):8.1f}   max {max(values):8.1f}')
+    print(f"{'import_queries':<18} {max(s['import_queries'] for s in samples)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
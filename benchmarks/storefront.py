@@ -0,0 +1,244 @@
+"""Storefront hot-path benchmark.
+
+Seeds a synthetic catalog, users, wishlists and orders into a throwaway SQLite
+database, drives the main storefront routes through the Flask test client and
+reports p50/p95/p99 latency, throughput and SQL statements per request.
+
+    python benchmarks/storefront.py --products 10000 --requests 300 --output results.json
+    python benchmarks/storefront.py --compare results.json   # exit 1 on a p95 regression
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+WORDS = ('fresh organic red green basmati whole wheat milk bread apple banana carrot tomato rice '
+         'spinach cheese butter yogurt coffee tea honey almond cashew lentil bean pepper onion '
+         'garlic mango orange grape lemon potato pasta flour sugar salt oil soap pen notebook').split()
+CATEGORIES = ('Fruits', 'Vegetables', 'Dairy', 'Bakery', 'Grains', 'Stationary', 'Snacks', 'Beverages')
+BATCH = 10000
+
+
+def seed(app_module, args, rng):
+    """Bulk-load the synthetic data set with executemany inserts"""
+    from datetime import datetime, timedelta
+    from werkzeug.security import generate_password_hash
+    db = app_module.db
+    m = app_module
+    now = datetime.utcnow()
+    with m.app.app_context():
+        db.create_all()
+        for start in range(0, args.products, BATCH):
+            db.session.execute(db.insert(m.Product), [{
+                'name': ' '.join(rng.choices(WORDS, k=3)).title() + f' #{i}',
+                'description': ' '.join(rng.choices(WORDS, k=12)),
+                'price': round(rng.uniform(5, 900), 2),
+                'category': rng.choice(CATEGORIES),
+                'stock': 10 ** 7,
+                'created_at': now - timedelta(seconds=i),
+                'updated_at': now - timedelta(seconds=i),
+            } for i in range(start, min(start + BATCH, args.products))])
+        # One real hash shared by every synthetic user keeps seeding fast
+        password_hash = generate_password_hash('Bench123!', 'pbkdf2:sha256:1000')
+        db.session.execute(db.insert(m.User), [{
+            'name': f'Bench User {i}', 'username': f'user{i}@bench.test', 'email': f'user{i}@bench.test',
+            'password_hash': password_hash, 'address': 'Bench Street', 'contact_number': '1234567890',
+        } for i in range(args.users)])
+        user_ids = [uid for (uid,) in db.session.query(m.User.id)]
+        wishlist_rows = []
+        for uid in user_ids:
+            for pid in rng.sample(range(1, args.products + 1), min(args.wishlist_size, args.products)):
+                wishlist_rows.append({'user_id': uid, 'product_id': pid})
+        db.session.execute(db.insert(m.Wishlist), wishlist_rows)
+        for start in range(0, args.orders, BATCH):
+            count = min(BATCH, args.orders - start)
+            db.session.execute(db.insert(m.Order), [{
+                'customer_name': 'Bench', 'customer_email': f'user{rng.randrange(args.users)}@bench.test',
+                'address': 'Bench Street', 'total_amount': 100.0, 'created_at': now,
+            } for _ in range(count)])
+        order_ids = [oid for (oid,) in db.session.query(m.Order.id)]
+        items = [{'order_id': oid, 'product_id': rng.randint(1, args.products),
+                  'quantity': rng.randint(1, 4), 'unit_price': 10.0}
+                 for oid in order_ids for _ in range(rng.randint(1, 6))]
+        for start in range(0, len(items), BATCH):
+            db.session.execute(db.insert(m.OrderItem), items[start:start + BATCH])
+        token = 'bench-shared-wishlist'
+        shared_ids = rng.sample(range(1, args.products + 1), min(args.wishlist_size, args.products))
+        db.session.add(m.SharedWishlist(token=token, user_id=user_ids[0], wishlist_data=json.dumps({
+            'user_name': 'Bench User 0',
+            'products': [{'id': pid, 'name': '', 'price': 0} for pid in shared_ids],
+        })))
+        db.session.commit()
+    return user_ids, token
+
+
+def scenarios(args, rng, token):
+    """name -> (logged_in, callable(client) -> response)"""
+    pid = lambda: rng.randint(1, args.products)
+
+    def checkout(client):
+        for _ in range(5):
+            client.post(f'/cart/add/{pid()}', data={'quantity': '1'}, headers={'X-Requested-With': 'XMLHttpRequest'})
+        return client.post('/checkout', data={'name': 'Bench', 'email': 'bench@bench.test', 'address': 'Bench Street'})
+
+    return {
+        'index': (False, lambda c: c.get('/')),
+        'index_category': (False, lambda c: c.get('/', query_string={'category': rng.choice(CATEGORIES)})),
+        'index_search': (False, lambda c: c.get('/', query_string={'q': rng.choice(WORDS)[:rng.randint(2, 5)]})),
+        'product_detail': (False, lambda c: c.get(f'/product/{pid()}')),
+        'api_products': (False, lambda c: c.get('/api/products', query_string={'limit': 50, 'min_price': rng.randint(0, 800)})),
+        'cart_add': (True, lambda c: c.post(f'/cart/add/{pid()}', data={'quantity': '1'},
+                                            headers={'X-Requested-With': 'XMLHttpRequest'})),
+        'cart_update': (True, lambda c: c.post(f'/cart/update/{pid()}', data={'quantity': str(rng.randint(1, 5))})),
+        'cart_view': (True, lambda c: c.get('/cart')),
+        'checkout': (True, checkout),
+        'shared_wishlist': (False, lambda c: c.get(f'/wishlist/shared/{token}')),
+    }
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    tmp = tempfile.mkdtemp(prefix='grocery-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+    sys.path.insert(0, ROOT)
+    import app as app_module
+
+    started = time.perf_counter()
+    user_ids, token = seed(app_module, args, rng)
+    seed_seconds = time.perf_counter() - started
+
+    results = {}
+    selected = args.only.split(',') if args.only else None
+    for name, (logged_in, call) in scenarios(args, rng, token).items():
+        if selected and name not in selected:
+            continue
+        client = app_module.app.test_client()
+        if logged_in:
+            with client.session_transaction() as sess:
+                sess['user_id'] = user_ids[0]
+                sess['user'] = 'Bench User 0'
+            for _ in range(args.cart_size):
+                client.post(f'/cart/add/{rng.randint(1, args.products)}', data={'quantity': '1'},
+                            headers={'X-Requested-With': 'XMLHttpRequest'})
+        for _ in range(args.warmup):
+            call(client)
+        latencies, queries = [], []
+        elapsed = 0.0
+        for _ in range(args.requests):
+            t0 = time.perf_counter()
+            response = call(client)
+            took = time.perf_counter() - t0
+            elapsed += took
+            latencies.append(took * 1000)
+            queries.append(int(response.headers.get('X-Query-Count', 0)))
+            if response.status_code >= 400:
+                raise SystemExit(f'{name}: HTTP {response.status_code}')
+            if logged_in:
+                # A browser would show these on the redirected page; don't let them pile up
+                with client.session_transaction() as sess:
+                    sess.pop('_flashes', None)
+        latencies.sort()
+        results[name] = {
+            'requests': args.requests,
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'throughput_rps': round(args.requests / elapsed, 1),
+            'queries_per_request': round(statistics.mean(queries), 2),
+        }
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'meta': {
+            'commit': commit,
+            'products': args.products,
+            'users': args.users,
+            'orders': args.orders,
+            'wishlist_size': args.wishlist_size,
+            'cart_size': args.cart_size,
+            'seed_seconds': round(seed_seconds, 2),
+            'python': sys.version.split()[0],
+        },
+        'scenarios': results,
+    }
+
+
+def print_report(report, baseline=None):
+    header = f"{'scenario':<18}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'queries':>9}"
+    if baseline:
+        header += f"{'p95 vs base':>13}"
+    print(header)
+    for name, r in report['scenarios'].items():
+        line = (f"{name:<18}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+                f"{r['throughput_rps']:>10.1f}{r['queries_per_request']:>9.2f}")
+        base = (baseline or {}).get('scenarios', {}).get(name)
+        if base:
+            line += f"{(r['p95_ms'] / base['p95_ms'] - 1) * 100:>12.1f}%"
+        print(line)
+
+
+def regressions(report, baseline, tolerance):
+    """Scenarios whose p95 got worse by more than tolerance, or that issue more queries"""
+    found = []
+    for name, r in report['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if not base:
+            continue
+        if r['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            found.append(f"{name}: p95 {base['p95_ms']:.2f} -> {r['p95_ms']:.2f} ms")
+        if r['queries_per_request'] > base['queries_per_request'] + 0.5:
+            found.append(f"{name}: queries/request {base['queries_per_request']} -> {r['queries_per_request']}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--wishlist-size', type=int, default=50)
+    parser.add_argument('--cart-size', type=int, default=60, help='lines in the logged-in cart')
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--only', help='comma separated scenario names')
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--compare', help='baseline JSON report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 slowdown (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    report = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if baseline:
+        found = regressions(report, baseline, args.tolerance)
+        for line in found:
+            print(f'REGRESSION {line}')
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,20 @@
 
 import os
+import re
+import sys
+import json
+import gzip
+import hashlib
 import shutil
+try:
+    import brotli
+except ImportError:  # optional: pip install Brotli to emit .br files
+    brotli = None
+
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 10
+# Text assets worth precompressing; images and fonts are already compressed
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.xml', '.map')
 
 def setup_for_render():
     """Reorganize files for Render deployment"""
@@ -56,6 +70,10 @@ def setup_for_render():
     else:
         print("⚠️  frontend/static directory not found!")
     
+    # Minify, fingerprint and precompress the copied assets
+    if os.path.exists('static'):
+        build_assets('static')
+
     # Create a simple Flask app configuration
     create_simple_app()
     
@@ -64,6 +82,144 @@ def setup_for_render():
     print(f"  - templates/ ({len(os.listdir('templates')) if os.path.exists('templates') else 0} files)")
     print(f"  - static/ ({len(os.listdir('static')) if os.path.exists('static') else 0} items)")
 
+def minify_css(css):
+    """Strip comments and needless whitespace; string contents are left alone"""
+    out = []
+    for part in re.split(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', css):
+        if part[:1] in ('"', "'"):
+            out.append(part)
+            continue
+        part = re.sub(r'/\*.*?\*/', '', part, flags=re.S)
+        part = re.sub(r'\s+', ' ', part)
+        # A space before ':' can be a descendant combinator (".a :hover"), so only trim after it
+        part = re.sub(r'\s*([{};,>])\s*', r'\1', part)
+        part = re.sub(r':\s+', ':', part)
+        part = re.sub(r'\s+:(?=[^{}]*[;}])', ':', part)
+        out.append(part.replace(';}', '}'))
+    return ''.join(out).strip()
+
+JS_REGEX_CONTEXT = re.compile(r'(?:^|[(,=:\[!&|?{};+\-*%<>~^]|\breturn|\btypeof)\s*$')
+
+def minify_js(js):
+    """Conservative JS minifier: drops comments, indentation and blank lines but keeps
+    line breaks, so automatic semicolon insertion behaves exactly as in the source.
+
+    Strings, template literals and regex literals are copied verbatim.
+    """
+    out, code, i, n = [], [], 0, len(js)
+
+    def flush():
+        chunk = re.sub(r'[ \t]*\n\s*', '\n', ''.join(code))
+        out.append(re.sub(r'[ \t]+', ' ', chunk))
+        code.clear()
+
+    while i < n:
+        c = js[i]
+        if c in '"\'`':
+            j = i + 1
+            while j < n and js[j] != c:
+                j += 2 if js[j] == '\\' else 1
+            flush()
+            out.append(js[i:j + 1])
+            i = j + 1
+        elif js.startswith('//', i):
+            i = js.find('\n', i)
+            i = n if i < 0 else i
+        elif js.startswith('/*', i):
+            end = js.find('*/', i + 2)
+            end = n if end < 0 else end + 2
+            code.append('\n' if '\n' in js[i:end] else ' ')
+            i = end
+        elif c == '/' and JS_REGEX_CONTEXT.search(''.join(out[-1:] + code)):
+            # Regex literal: copy up to the closing slash, minding escapes and [...] classes
+            j, in_class = i + 1, False
+            while j < n and (in_class or js[j] != '/') and js[j] != '\n':
+                if js[j] == '\\':
+                    j += 1
+                elif js[j] == '[':
+                    in_class = True
+                elif js[j] == ']':
+                    in_class = False
+                j += 1
+            flush()
+            out.append(js[i:j + 1])
+            i = j + 1
+        else:
+            j = i + 1
+            while j < n and js[j] not in '"\'`/':
+                j += 1
+            code.append(js[i:j])
+            i = j
+    flush()
+    return ''.join(out).strip()
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+def fingerprint(relpath, content):
+    root, ext = os.path.splitext(relpath)
+    return f"{root}.{hashlib.sha256(content).hexdigest()[:HASH_LENGTH]}{ext}"
+
+def write_compressed(path, content):
+    """Write .gz (and .br when Brotli is installed) next to path if they are smaller"""
+    written = []
+    variants = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', lambda data: brotli.compress(data, quality=11)))
+    for suffix, compress in variants:
+        packed = compress(content)
+        if len(packed) < len(content):
+            with open(path + suffix, 'wb') as f:
+                f.write(packed)
+            written.append(suffix)
+    return written
+
+def build_assets(static_dir):
+    """Minify CSS/JS, write content-hashed copies of every asset, precompress them and
+    record original -> hashed names in manifest.json for the app's url_for('static').
+
+    Originals stay in place so URLs that bypass the manifest keep working.
+    """
+    manifest_path = os.path.join(static_dir, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        # Drop the previous build's outputs so stale hashes don't pile up
+        with open(manifest_path) as f:
+            for hashed in json.load(f).values():
+                for suffix in ('', '.gz', '.br'):
+                    path = os.path.join(static_dir, hashed + suffix)
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    manifest = {}
+    before = after = 0
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if not d.startswith(('.', '__'))]
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            relpath = os.path.relpath(path, static_dir).replace(os.sep, '/')
+            if relpath == MANIFEST_NAME or name.endswith(('.gz', '.br')) or name.startswith('.'):
+                continue
+            with open(path, 'rb') as f:
+                content = f.read()
+            ext = os.path.splitext(name)[1].lower()
+            if ext in MINIFIERS:
+                content = MINIFIERS[ext](content.decode('utf-8')).encode('utf-8')
+            hashed = fingerprint(relpath, content)
+            out_path = os.path.join(static_dir, hashed)
+            with open(out_path, 'wb') as f:
+                f.write(content)
+            manifest[relpath] = hashed
+            variants = write_compressed(out_path, content) if ext in COMPRESSIBLE else []
+            before += os.path.getsize(path)
+            after += len(content)
+            print(f"✓ {relpath} -> {hashed} {' '.join(variants)}")
+
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    if brotli is None:
+        print("⚠️  Brotli not installed; only .gz variants were written.")
+    print(f"✓ Wrote {manifest_path}: {len(manifest)} assets, {before} -> {after} bytes before compression")
+    return manifest
+
 def create_simple_app():
     """Create a simplified app.py for deployment"""
     app_content = '''import os
@@ -99,4 +255,8 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     print("✓ App configuration ready for simple deployment")
 
 if __name__ == "__main__":
-    setup_for_render()
\ No newline at end of file
+    # `python build.py assets DIR` runs only the asset pipeline on DIR, e.g. frontend/static
+    if len(sys.argv) > 1 and sys.argv[1] == 'assets':
+        build_assets(sys.argv[2] if len(sys.argv) > 2 else 'static')
+    else:
+        setup_for_render()
\ No newline at end of file
@@ -1,47 +1,118 @@
 document.addEventListener("DOMContentLoaded", () => {
-  // Select all add-to-cart forms
-  const addForms = document.querySelectorAll(".add-row");
+  const CART_API = "/api/cart";
+  const BATCH_DELAY = 300; // ms of quiet before queued clicks are sent
+  const CART_FORM = /^\/cart\/(add|update|remove)\/(\d+)$/;
 
-  addForms.forEach((form) => {
-    form.addEventListener("submit", async (e) => {
-      e.preventDefault();
+  // Pending changes keyed by product id; several clicks on one product merge into one op
+  let pending = new Map();
+  let timer = null;
+  let inFlight = false;
 
-      const formData = new FormData(form);
-      const pid = form.action.split("/").pop(); // get product id from URL
-      const qty = formData.get("qty") || 1;
+  function queue(op, pid, qty) {
+    const prev = pending.get(pid);
+    if (op === "add" && prev && prev.op !== "remove") {
+      // add on top of add keeps adding; add on top of set raises the target
+      pending.set(pid, { op: prev.op, product_id: pid, quantity: prev.quantity + qty });
+    } else if (op === "add" && prev) {
+      pending.set(pid, { op: "set", product_id: pid, quantity: qty });
+    } else {
+      pending.set(pid, { op: op, product_id: pid, quantity: qty });
+    }
+    clearTimeout(timer);
+    timer = setTimeout(flush, BATCH_DELAY);
+  }
 
-      try {
-        const response = await fetch(form.action, {
-          method: "POST",
-          body: formData,
-        });
-
-        if (!response.ok) throw new Error("Network response was not ok");
-
-        const data = await response.json();
+  async function flush() {
+    // One batch at a time, so the server sees the clicks in order
+    if (inFlight || pending.size === 0) return;
+    const ops = Array.from(pending.values());
+    pending = new Map();
+    inFlight = true;
+    try {
+      const response = await fetch(CART_API, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ ops: ops }),
+      });
+      if (response.status === 401) {
+        window.location.href = "/login";
+        return;
+      }
+      const data = await response.json();
+      if (!response.ok) throw new Error(data.error || "Failed to update cart.");
+      renderCart(data);
+      const added = ops.filter((o) => o.op === "add").length;
+      if (added) showFlash(added === 1 ? "Added to cart." : `Added ${added} items to cart.`, "success");
+    } catch (err) {
+      console.error(err);
+      showFlash(err.message || "Error updating cart.", "danger");
+    } finally {
+      inFlight = false;
+      if (pending.size) flush();
+    }
+  }
 
-        if (data.success) {
-          // Update cart count dynamically
-          const cartCount = document.querySelector(".cart-count");
-          if (cartCount) {
-            cartCount.textContent = data.cart_count;
-          } else {
-            // If cart-count span doesn't exist yet, create it
-            const cartLink = document.querySelector(".nav-right .cta");
-            const span = document.createElement("span");
-            span.className = "cart-count";
-            span.textContent = data.cart_count;
-            cartLink.appendChild(span);
-          }
+  function renderCart(data) {
+    const link = document.querySelector(".cart-link");
+    if (link) {
+      let badge = link.querySelector(".cart-badge");
+      if (!badge && data.cart_count > 0) {
+        badge = document.createElement("span");
+        badge.className = "cart-badge";
+        link.appendChild(badge);
+      }
+      if (badge) {
+        if (data.cart_count > 0) badge.textContent = data.cart_count;
+        else badge.remove();
+      }
+    }
 
-          alert(`${data.product_name} added to cart!`);
-        } else {
-          alert(data.message || "Failed to add item.");
-        }
-      } catch (err) {
-        console.error(err);
-        alert("Error adding item to cart.");
+    // On the cart page, patch the lines in place instead of reloading
+    const list = document.querySelector(".cart-items");
+    if (!list) return;
+    if (data.lines.length === 0) {
+      window.location.reload();
+      return;
+    }
+    const lines = new Map(data.lines.map((l) => [String(l.product_id), l]));
+    list.querySelectorAll(".cart-item").forEach((row) => {
+      const line = lines.get(row.dataset.productId);
+      if (!line) {
+        row.remove();
+        return;
       }
+      row.querySelector(".subtotal").textContent = `₹${line.subtotal.toFixed(2)}`;
+      const input = row.querySelector("input[name='quantity']");
+      if (input && document.activeElement !== input) input.value = line.quantity;
     });
+    const total = document.querySelector(".cart-total");
+    if (total) total.textContent = `₹${data.total.toFixed(2)}`;
+  }
+
+  function showFlash(message, category) {
+    const container = document.querySelector(".flash-container");
+    if (!container) return;
+    const flash = document.createElement("div");
+    flash.className = `flash flash-${category}`;
+    flash.textContent = message;
+    container.appendChild(flash);
+    setTimeout(() => {
+      flash.style.opacity = "0";
+      setTimeout(() => flash.remove(), 300);
+    }, 3000);
+  }
+
+  // Cart forms keep working without JavaScript; with it, their submits are batched
+  document.addEventListener("submit", (e) => {
+    const form = e.target;
+    const match = CART_FORM.exec(new URL(form.action, window.location.href).pathname);
+    if (!match) return;
+    e.preventDefault();
+    const pid = Number(match[2]);
+    const input = form.querySelector("input[name='quantity'], input[name='qty']");
+    const qty = Math.max(parseInt(input ? input.value : "1", 10) || 0, 0);
+    if (match[1] === "add") queue("add", pid, Math.max(qty, 1));
+    else if (match[1] === "update") queue("set", pid, qty);
+    else queue("remove", pid, 0);
   });
 });
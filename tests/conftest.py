@@ -0,0 +1,24 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app reads its configuration at import time
+_db_dir = tempfile.mkdtemp()
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_db_dir, 'test.db'))
+os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app as flask_app, init_db  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    init_db()
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,35 @@
+import pytest
+
+
+@pytest.fixture
+def admin(client):
+    with client.session_transaction() as sess:
+        sess['is_admin'] = True
+    return client
+
+
+def test_patch_edits_every_row_field(app, admin):
+    from app import Product, db
+    response = admin.patch('/admin/api/products', json={'updates': [
+        {'id': 2, 'name': 'Renamed', 'description': 'Fresh daily', 'category': 'Bakery',
+         'image_url': 'https://example.com/bread.jpg'},
+    ]})
+    assert response.status_code == 200
+    assert response.get_json() == {'updated': [2], 'errors': []}
+    with app.app_context():
+        product = db.session.get(Product, 2)
+        assert (product.name, product.description, product.category, product.image_url) == \
+            ('Renamed', 'Fresh daily', 'Bakery', 'https://example.com/bread.jpg')
+
+
+def test_patch_reports_unknown_fields(admin):
+    response = admin.patch('/admin/api/products', json={'updates': [{'id': 2, 'owner': 'x'}]})
+    assert response.get_json()['updated'] == []
+    assert 'owner' in response.get_json()['errors'][0]['error']
+
+
+def test_rows_keep_the_full_edit_form(admin):
+    html = admin.get('/admin').get_data(as_text=True)
+    assert 'action="/admin/products/2/update"' in html
+    for field in ('name', 'description', 'category', 'image_url'):
+        assert f'name="{field}"' in html
@@ -0,0 +1,37 @@
+import socket
+from unittest import mock
+
+import pytest
+
+
+@pytest.mark.parametrize('url', ['http://images.example/a.jpg', 'https://images.example/a.jpg'])
+def test_fetch_connects_to_the_checked_address(app, url):
+    from app import HTTPImageFetcher, ImageFetchError
+    answers = iter(['93.184.216.34', '127.0.0.1'])  # a rebinding resolver flips to loopback on the next lookup
+
+    def getaddrinfo(host, port, *args, **kwargs):
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (next(answers), port))]
+
+    with mock.patch('socket.getaddrinfo', side_effect=getaddrinfo), \
+            mock.patch('socket.create_connection', side_effect=ConnectionRefusedError) as connect:
+        with pytest.raises(ImageFetchError):
+            HTTPImageFetcher(timeout=1, max_bytes=1024).fetch(url)
+    assert connect.call_args[0][0][0] == '93.184.216.34'
+
+
+@pytest.mark.parametrize('address', [
+    '127.0.0.1', '10.0.0.5', '169.254.169.254', '100.100.100.200', '100.64.0.1', '224.0.0.1', '0.0.0.0',
+    '::1', 'ff02::1', '::', '::ffff:127.0.0.1', '::ffff:100.100.100.200', '::ffff:224.0.0.1',
+])
+def test_fetch_refuses_non_public_addresses(app, address):
+    from app import HTTPImageFetcher, ImageFetchError
+    family = socket.AF_INET6 if ':' in address else socket.AF_INET
+
+    def getaddrinfo(host, port, *args, **kwargs):
+        return [(family, socket.SOCK_STREAM, 6, '', (address, port))]
+
+    with mock.patch('socket.getaddrinfo', side_effect=getaddrinfo), \
+            mock.patch('socket.create_connection') as connect:
+        with pytest.raises(ImageFetchError, match='private address'):
+            HTTPImageFetcher(timeout=1, max_bytes=1024).fetch('http://images.example/a.jpg')
+    connect.assert_not_called()
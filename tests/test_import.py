@@ -0,0 +1,30 @@
+import io
+
+
+def test_import_reports_bad_rows_and_keeps_going(app):
+    from app import Product, db, import_products
+    csv_text = '\n'.join([
+        'name,price,category,image_url',
+        'Import apples,1.5,Fruit,',
+        'Import rejected,2,Fruit,',
+        'Import long url,3,Fruit,https://example.com/' + 'a' * 300,
+        'Import long category,4,' + 'c' * 100 + ',',
+        'Import pears,5,Fruit,',
+    ]) + '\n'
+    with app.app_context():
+        db.session.execute(db.text(
+            "CREATE TRIGGER reject_import BEFORE INSERT ON product WHEN NEW.name = 'Import rejected' "
+            "BEGIN SELECT RAISE(ABORT, 'row rejected'); END"
+        ))
+        db.session.commit()
+        try:
+            result = import_products(io.StringIO(csv_text), 'csv')
+        finally:
+            db.session.execute(db.text('DROP TRIGGER reject_import'))
+            db.session.commit()
+        assert result.inserted == 3
+        assert [e['row'] for e in result.errors] == [4, 3]
+        assert 'row rejected' in result.errors[1]['error']
+        names = set(db.session.scalars(db.select(Product.name).where(Product.name.like('Import %'))))
+        assert names == {'Import apples', 'Import long category', 'Import pears'}
+        assert db.session.scalar(db.select(Product.category).where(Product.name == 'Import long category')) == 'c' * 80
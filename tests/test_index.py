@@ -0,0 +1,13 @@
+def listing_keys():
+    from app import catalog_cache
+    return {key for key in list(catalog_cache._entries) if key[0] == 'product_cards'}
+
+
+def test_search_pages_do_not_cache_their_listing(client):
+    client.get('/')
+    before = listing_keys()
+    for q in ('fresh', 'Fresh', 'fresh fresh', 'zz-no-match'):
+        assert client.get('/', query_string={'q': q}).status_code == 200
+    client.get('/', query_string={'category': 'no such category'})
+    assert listing_keys() == before
+    assert any(key[1] == ('index', '') for key in before)
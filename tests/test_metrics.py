@@ -0,0 +1,23 @@
+import ipaddress
+
+import pytest
+
+
+@pytest.fixture
+def metrics_config(app, monkeypatch):
+    import app as module
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 's3cret')
+    monkeypatch.setattr(module, 'METRICS_NETWORKS', (ipaddress.ip_network('10.0.0.0/8'),))
+
+
+@pytest.mark.parametrize('path', ['/metrics', '/api/catalog/cache'])
+def test_internal_endpoints_are_closed_by_default(client, path):
+    assert client.get(path).status_code == 404
+
+
+@pytest.mark.parametrize('path', ['/metrics', '/api/catalog/cache'])
+def test_token_or_allowed_network_opens_internal_endpoints(client, metrics_config, path):
+    assert client.get(path).status_code == 404
+    assert client.get(path, headers={'Authorization': 'Bearer wrong'}).status_code == 404
+    assert client.get(path, headers={'Authorization': 'Bearer s3cret'}).status_code == 200
+    assert client.get(path, environ_base={'REMOTE_ADDR': '10.1.2.3'}).status_code == 200
@@ -0,0 +1,51 @@
+from unittest import mock
+
+
+def order(app, pid, qty):
+    from app import Product, db, place_order
+    product = db.session.get(Product, pid)
+    return place_order([{'product': product, 'qty': qty, 'subtotal': product.price * qty}],
+                       'Test', 'test@example.com', 'Somewhere')
+
+
+def test_fallback_reserves_each_line_once(app):
+    from app import Product, db
+    with app.app_context():
+        db.session.get(Product, 4).stock = 10
+        db.session.commit()
+        dialect = type(db.session.get_bind().dialect)
+        with mock.patch.object(dialect, 'supports_sane_multi_rowcount', False):
+            order(app, 4, 3)
+        db.session.expire_all()
+        assert db.session.get(Product, 4).stock == 7
+
+
+def test_order_keeps_catalog_cached(app):
+    from app import Product, catalog_cache, catalog_product, catalog_products, db
+    with app.app_context():
+        catalog_products()
+        assert catalog_product(5).stock > 0
+        updated_at = db.session.get(Product, 5).updated_at
+        version = catalog_cache.version
+        order(app, 5, 1)
+        assert catalog_cache.version == version
+        # The ordered product's snapshot is reloaded with its new stock
+        assert catalog_product(5).stock == db.session.get(Product, 5).stock
+        assert db.session.get(Product, 5).updated_at == updated_at
+
+
+def test_order_refreshes_api_stock(app, client):
+    from app import Product, db
+    first = client.get('/api/products?limit=10')
+    without_stock = client.get('/api/products?limit=10&fields=id,name')
+    with app.app_context():
+        stock = db.session.get(Product, 9).stock
+        order(app, 9, 1)
+    again = client.get('/api/products?limit=10', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 200
+    assert again.headers['ETag'] != first.headers['ETag']
+    assert {p['id']: p['stock'] for p in again.get_json()['items']}[9] == stock - 1
+    # Responses without stock keep their validator
+    unchanged = client.get('/api/products?limit=10&fields=id,name',
+                           headers={'If-None-Match': without_stock.headers['ETag']})
+    assert unchanged.status_code == 304
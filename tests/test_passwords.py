@@ -0,0 +1,22 @@
+import pytest
+
+from app import PasswordHasher
+
+
+@pytest.mark.parametrize('method, stored, expected', [
+    ('scrypt:32768:8:1', 'scrypt:32768:8:1', False),
+    ('scrypt:32768:8:1', 'scrypt', False),
+    ('scrypt', 'scrypt:32768:8:1', False),
+    ('scrypt:32768:8:1', 'scrypt:16384:8:1', True),
+    ('scrypt:32768:8:1', 'scrypt:65536:8:1', False),
+    ('pbkdf2:sha256:600000', 'pbkdf2:sha256', False),
+    ('pbkdf2:sha256:600000', 'pbkdf2', False),
+    ('pbkdf2:sha256:600000', 'pbkdf2:sha256:260000', True),
+    ('pbkdf2:sha256:600000', 'pbkdf2:sha1:600000', True),
+    ('scrypt:32768:8:1', 'pbkdf2:sha256:600000', True),
+    ('scrypt:32768:8:1', 'md5', True),
+    ('scrypt:32768:8:1', 'scrypt:lots', True),
+])
+def test_needs_rehash_compares_parameters(method, stored, expected):
+    hasher = PasswordHasher(method, workers=0, queue_depth=1, timeout=1)
+    assert hasher.needs_rehash(f'{stored}$salt$digest') is expected
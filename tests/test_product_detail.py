@@ -0,0 +1,19 @@
+def test_revalidation_skips_the_database(client):
+    first = client.get('/product/3')
+    assert first.status_code == 200
+    again = client.get('/product/3', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.headers['X-Query-Count'] == '0'
+
+
+def test_recommendations_follow_a_recompute(app, client):
+    from app import ProductPair, catalog_products, db, product_recommendations, refresh_recommendations
+    with app.app_context():
+        catalog_products()
+        assert product_recommendations(7) == []
+        db.session.add_all([ProductPair(product_id=7, other_id=7, orders=2),
+                            ProductPair(product_id=7, other_id=8, orders=1)])
+        refresh_recommendations([7])
+        db.session.commit()
+        assert [p.id for p in product_recommendations(7)] == [8]
+    assert client.get('/product/7').status_code == 200
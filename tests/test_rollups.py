@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+
+def place(app, pid):
+    from app import Product, db, place_order
+    product = db.session.get(Product, pid)
+    return place_order([{'product': product, 'qty': 1, 'subtotal': product.price}],
+                       'Test', 'test@example.com', 'Somewhere')
+
+
+def test_catch_up_waits_for_recent_orders(app):
+    from app import Order, catch_up_sales_rollups, db, sales_watermark
+    with app.app_context():
+        catch_up_sales_rollups(lag=0)
+        first = place(app, 6)
+        second = place(app, 6)
+        # Only the later order is old enough; the earlier one may still be committing elsewhere
+        db.session.get(Order, second.id).created_at = datetime.utcnow() - timedelta(minutes=5)
+        db.session.commit()
+        catch_up_sales_rollups()
+        assert sales_watermark() < first.id
+        db.session.get(Order, first.id).created_at = datetime.utcnow() - timedelta(minutes=5)
+        db.session.commit()
+        assert catch_up_sales_rollups() == 2
+        assert sales_watermark() == second.id
+
+
+def test_rollup_job_counts_its_order(app):
+    from app import (COPURCHASE_WATERMARK, DailySales, Job, Order, catch_up_recommendations,
+                     catch_up_sales_rollups, db, job_worker, sales_watermark)
+    with app.app_context():
+        catch_up_sales_rollups(lag=0)
+        catch_up_recommendations(lag=0)
+        counted = db.session.scalar(db.select(db.func.sum(DailySales.orders))) or 0
+        order_id = place(app, 6).id
+
+    def due(key):
+        db.session.execute(db.update(Job).where(Job.idempotency_key == key)
+                           .values(run_at=datetime.utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+
+    def watermarks():
+        return sales_watermark(), sales_watermark(COPURCHASE_WATERMARK)
+
+    with app.app_context():
+        job_worker.run_pending()
+        assert db.session.scalar(db.select(Job.status).where(Job.idempotency_key == f'sales-rollup:{order_id}')) == 'queued'
+        # Run early, while the order is still inside the lag window: the job looks again later
+        due(f'sales-rollup:{order_id}')
+        job_worker.run_pending()
+        assert max(watermarks()) < order_id
+        assert db.session.scalar(db.select(Job.status).where(Job.idempotency_key == f'sales-rollup:{order_id}:1')) == 'queued'
+        db.session.get(Order, order_id).created_at = datetime.utcnow() - timedelta(minutes=5)
+        db.session.commit()
+        due(f'sales-rollup:{order_id}:1')
+        job_worker.run_pending()
+        assert watermarks() == (order_id, order_id)
+        assert db.session.scalar(db.select(db.func.sum(DailySales.orders))) == counted + 1
@@ -0,0 +1,38 @@
+import json
+import uuid
+
+
+def share(app, product_ids):
+    from app import Product, SharedWishlist, db
+    with app.app_context():
+        products = [db.session.get(Product, pid) for pid in product_ids]
+        token = str(uuid.uuid4())
+        db.session.add(SharedWishlist(token=token, user_id=1, wishlist_data=json.dumps({
+            'user_name': 'Asha',
+            'products': [{'id': p.id, 'name': p.name, 'price': p.price} for p in products],
+        })))
+        db.session.commit()
+    return token
+
+
+def test_unknown_tokens_are_not_cached(client):
+    from app import catalog_cache, fragment_cache
+    catalog_entries = catalog_cache.stats()['entries']
+    fragment_entries = fragment_cache.stats()['entries']
+    for _ in range(5):
+        response = client.get(f'/wishlist/shared/{uuid.uuid4()}')
+        assert response.status_code == 302
+    assert catalog_cache.stats()['entries'] == catalog_entries
+    assert fragment_cache.stats()['entries'] == fragment_entries
+
+
+def test_shared_page_is_served_from_fragment_cache(app, client):
+    from app import fragment_cache
+    token = share(app, [1, 2])
+    first = client.get(f'/wishlist/shared/{token}')
+    assert first.status_code == 200
+    assert b"Asha's Wishlist" in first.data
+    hits = fragment_cache.stats()['hits']
+    second = client.get(f'/wishlist/shared/{token}')
+    assert second.data == first.data
+    assert fragment_cache.stats()['hits'] == hits + 1